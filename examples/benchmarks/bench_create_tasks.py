@@ -0,0 +1,91 @@
+"""
+Compares building batch task files with iterrows and one json.dumps per task against the
+column-oriented template writer, on data/imdb_top_1000.csv scaled up.
+
+Usage:
+    python examples/benchmarks/bench_create_tasks.py --rows 1000000
+"""
+import argparse
+import io
+import json
+import sys
+import time
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import helpers
+
+DATA = Path(__file__).resolve().parents[2] / "data" / "imdb_top_1000.csv"
+SYSTEM_PROMPT = "Classify the main genre of the given movie description. Respond with only the genre."
+MODEL = "klusterai/Meta-Llama-3.3-70B-Instruct-Turbo"
+
+
+def tasks_iterrows(df, task_type, system_prompt, model, content_column):
+    """
+    Previous create_tasks + save_tasks, writing to a buffer instead of a file.
+    """
+    tasks = []
+    for index, row in df.iterrows():
+        content = row[content_column]
+        tasks.append({
+            "custom_id": f"{task_type}-{index}",
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": {
+                "model": model,
+                "temperature": 0,
+                "max_completion_tokens": 100,
+                "messages": [
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": content},
+                ],
+            }
+        })
+    file = io.StringIO()
+    for task in tasks:
+        file.write(json.dumps(task) + '\n')
+    return file.getvalue().encode()
+
+
+def main_bench():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=1000000)
+    args = parser.parse_args()
+
+    base = pd.read_csv(DATA)
+    df = pd.concat([base] * -(-args.rows // len(base)), ignore_index=True).head(args.rows)
+
+    start = time.perf_counter()
+    legacy = tasks_iterrows(df, "classification", SYSTEM_PROMPT, MODEL, "Overview")
+    legacy_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    tasks = helpers.create_tasks(df, "classification", SYSTEM_PROMPT, MODEL, "Overview")
+    file = io.BytesIO()
+    file.writelines(helpers.dumps(task) + b'\n' for task in tasks)
+    dicts = file.getvalue()
+    dicts_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    file = io.BytesIO()
+    helpers.write_tasks(file, df, "classification", SYSTEM_PROMPT, MODEL, "Overview")
+    spliced = file.getvalue()
+    spliced_time = time.perf_counter() - start
+
+    expected = [json.loads(line) for line in legacy.splitlines()]
+    assert [json.loads(line) for line in dicts.splitlines()] == expected
+    assert [json.loads(line) for line in spliced.splitlines()] == expected
+    assert spliced == dicts, "write_tasks and save_tasks wrote different bytes"
+    backend = "orjson" if helpers.orjson is not None else "json"
+    print(f"{len(df)} rows, {len(legacy) / 1024 / 1024:.1f} MB of tasks, {backend} backend")
+    print(f"iterrows + json.dumps:      {legacy_time:.3f}s")
+    print(f"create_tasks + save_tasks:  {dicts_time:.3f}s")
+    print(f"write_tasks (template):     {spliced_time:.3f}s")
+    print(f"Speedup: {legacy_time / spliced_time:.1f}x")
+
+
+if __name__ == "__main__":
+    main_bench()
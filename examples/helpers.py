@@ -1,13 +1,19 @@
 import json
+import mmap
+import os
+import re
 from IPython.display import clear_output, display
 import time
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 def create_tasks(df, task_type, system_prompt, model, content_column):
-    tasks = []
-    for index, row in df.iterrows():
-        content = row[content_column]
-        
-        task = {
+    # Reads the content column once instead of building a Series per row with iterrows
+    return [
+        {
             "custom_id": f"{task_type}-{index}",
             "method": "POST",
             "url": "/v1/chat/completions",
@@ -21,22 +27,85 @@ def create_tasks(df, task_type, system_prompt, model, content_column):
                 ],
             }
         }
-        tasks.append(task)
-    return tasks
+        for index, content in zip(df.index.tolist(), df[content_column].tolist())
+    ]
 
 def save_tasks(tasks, task_type):
     filename = f"batch_tasks_{task_type}.jsonl"
-    with open(filename, 'w') as file:
-        for task in tasks:
-            file.write(json.dumps(task) + '\n')
+    with open(filename, 'wb') as file:
+        file.writelines(dumps(task) + b'\n' for task in tasks)
     return filename
 
+def dumps(obj):
+    # JSON as bytes, using orjson when it is installed
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj).encode()
+
+_CUSTOM_ID = "\0custom_id"
+_CONTENT = "\0content"
+
+def task_template(task_type, system_prompt, model, max_completion_tokens=100):
+    # Serializes the request envelope shared by every task once and splits it around the
+    # custom_id and user content, so only those need to be encoded per row. Uses dumps like
+    # save_tasks, so both write the same bytes
+    envelope = dumps({
+        "custom_id": _CUSTOM_ID,
+        "method": "POST",
+        "url": "/v1/chat/completions",
+        "body": {
+            "model": model,
+            "temperature": 0,
+            "max_completion_tokens": max_completion_tokens,
+            "messages": [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": _CONTENT},
+            ],
+        }
+    })
+    head, rest = envelope.split(dumps(_CUSTOM_ID))
+    middle, tail = rest.split(dumps(_CONTENT))
+    return head, middle, tail + b'\n'
+
+def write_tasks(file, df, task_type, system_prompt, model, content_column, max_completion_tokens=100):
+    # Writes one task per row of df to a binary file handle or buffer (e.g. io.BytesIO)
+    head, middle, tail = task_template(task_type, system_prompt, model, max_completion_tokens)
+    file.writelines(
+        b"".join((head, dumps(f"{task_type}-{index}"), middle, dumps(content), tail))
+        for index, content in zip(df.index.tolist(), df[content_column].tolist())
+    )
+    return len(df)
+
+def save_df_tasks(df, task_type, system_prompt, model, content_column):
+    # Same file as save_tasks(create_tasks(...)), without building a dict per task
+    filename = f"batch_tasks_{task_type}.jsonl"
+    with open(filename, 'wb') as file:
+        write_tasks(file, df, task_type, system_prompt, model, content_column)
+    return filename
+
+def dedupe_rows(df, content_column):
+    # Keeps the first row of each distinct content, since every task of a job shares its model and
+    # system prompt. Returns those rows and, for every row of df, the index label of the row whose
+    # task answers it; pass that as index to get_results to fan the answers back out
+    contents = df[content_column]
+    unique_df = df[~contents.duplicated()]
+    first_label = dict(zip(unique_df[content_column].tolist(), unique_df.index.tolist()))
+    fanout = [first_label[content] for content in contents.tolist()]
+
+    duplicates = len(df) - len(unique_df)
+    saved_chars = contents.astype(str).str.len().sum() - unique_df[content_column].astype(str).str.len().sum()
+    print(f"Deduplicated {len(df)} rows to {len(unique_df)} requests: "
+          f"{duplicates} duplicates ({duplicates / max(len(df), 1):.1%}), {saved_chars} characters not sent")
+    return unique_df, fanout
+
 def create_batch_job(file_name, client):
     print(f"Creating batch job for {file_name}")
-    batch_file = client.files.create(
-        file=open(file_name, "rb"),
-        purpose="batch"
-    )
+    # httpx streams the open file in 64 KB chunks, the with block closes it after the upload
+    with open(file_name, "rb") as file:
+        batch_file = client.files.create(
+            file=file,
+            purpose="batch"
+        )
 
     batch_job = client.batches.create(
         input_file_id=batch_file.id,
@@ -62,40 +131,259 @@ def parse_json_objects(data_string):
 
     return json_objects
 
-def monitor_job_status(client, job_id, task_type):
-    all_completed = False
+TERMINAL_STATUSES = ("completed", "failed", "canceled", "cancelled", "expired")
 
-    while not all_completed:
-        all_completed = True
-        output_lines = []
+def monitor_jobs(client, jobs, min_interval=2, max_interval=60):
+    # jobs maps a task type to a job id; yields (task_type, job) as each job finishes
+    state = {
+        task_type: {"job": None, "start": None, "start_completed": 0, "interval": min_interval, "next_poll": 0.0}
+        for task_type in jobs
+    }
 
-        updated_job = client.batches.retrieve(job_id)
+    while True:
+        pending = [task_type for task_type, s in state.items()
+                   if s["job"] is None or s["job"].status.lower() not in TERMINAL_STATUSES]
+        if not pending:
+            break
 
-        if updated_job.status.lower() != "completed":
-            all_completed = False
-            completed = updated_job.request_counts.completed
-            total = updated_job.request_counts.total
-            output_lines.append(f"{task_type.capitalize()} job status: {updated_job.status} - Progress: {completed}/{total}")
-        else:
-            output_lines.append(f"{task_type.capitalize()} job completed!")
+        finished = []
+        now = time.monotonic()
+        for task_type in pending:
+            s = state[task_type]
+            if s["next_poll"] > now:
+                continue
+
+            previous = s["job"]
+            s["job"] = job = client.batches.retrieve(jobs[task_type])
+            now = time.monotonic()
+            completed = job.request_counts.completed
+            if s["start"] is None:
+                s["start"], s["start_completed"] = now, completed
+
+            if job.status.lower() in TERMINAL_STATUSES:
+                finished.append(task_type)
+                continue
+
+            # Poll at half the estimated time left while the job progresses, back off while it stalls
+            rate = (completed - s["start_completed"]) / (now - s["start"]) if now > s["start"] else 0
+            if previous is not None and completed > previous.request_counts.completed and rate > 0:
+                s["interval"] = (job.request_counts.total - completed) / rate / 2
+            elif previous is not None:
+                s["interval"] *= 2
+            s["interval"] = min(max_interval, max(min_interval, s["interval"]))
+            s["next_poll"] = now + s["interval"]
 
         # Clear the output and display updated status
         clear_output(wait=True)
-        for line in output_lines:
+        for task_type, s in state.items():
+            job = s["job"]
+            if job is None:
+                continue
+            if job.status.lower() in TERMINAL_STATUSES:
+                display(f"{task_type.capitalize()} job {job.status}!")
+                continue
+            completed, total = job.request_counts.completed, job.request_counts.total
+            line = f"{task_type.capitalize()} job status: {job.status} - Progress: {completed}/{total}"
+            elapsed = time.monotonic() - s["start"]
+            if completed > s["start_completed"] and elapsed > 0:
+                eta = (total - completed) / ((completed - s["start_completed"]) / elapsed)
+                line += f" - ETA: {round(eta)}s"
             display(line)
 
-        if not all_completed:
-            time.sleep(10)
+        for task_type in finished:
+            yield task_type, state[task_type]["job"]
+
+        waiting = [state[task_type]["next_poll"] for task_type in pending if task_type not in finished]
+        if waiting:
+            time.sleep(max(0.0, min(waiting) - time.monotonic()))
+
+def monitor_job_status(client, job_id, task_type):
+    for _, job in monitor_jobs(client, {task_type: job_id}):
+        return job
+
+def iter_partial_results(client, job_id, min_interval=2, max_interval=60, task_type=None, index=None):
+    # Yields (row label, answer) pairs as soon as they show up in the job's output file,
+    # so a DataFrame can be filled while the job is still running. Labels are those of index
+    # (the DataFrame index the tasks were created from) matched by their full custom_id,
+    # or the custom_id itself when no index is given. The output file is streamed to disk
+    # whenever more requests have completed and read back line by line
+    labels = {f"{task_type}-{label}": label for label in index} if index is not None else {}
+    seen = set()
+    interval = min_interval
+    filename = f"batch_results_{job_id}.jsonl"
+    downloaded = -1
+
+    while True:
+        job = client.batches.retrieve(job_id)
+        finished = job.status.lower() in TERMINAL_STATUSES
+        new_results = 0
+
+        if job.output_file_id and (finished or job.request_counts.completed > downloaded):
+            downloaded = job.request_counts.completed
+            download_results(client, job.output_file_id, filename)
+            with open(filename, 'rb') as file:
+                for line in file:
+                    if not line.strip():
+                        continue
+                    res = loads(line)
+                    if res['custom_id'] in seen:
+                        continue
+                    seen.add(res['custom_id'])
+                    new_results += 1
+                    yield labels.get(res['custom_id'], res['custom_id']), res['response']['body']['choices'][0]['message']['content']
+
+        if finished:
+            break
+
+        # Check back quickly while results keep coming in, back off while they don't
+        interval = min_interval if new_results else min(max_interval, interval * 2)
+        time.sleep(interval)
+
+def loads(data):
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def download_results(client, file_id, filename, chunk_size=1024 * 1024):
+    # Streams the result file to disk instead of holding the whole payload in memory
+    with client.files.with_streaming_response.content(file_id) as response:
+        with open(filename, 'wb') as file:
+            for chunk in response.iter_bytes(chunk_size):
+                file.write(chunk)
+    return filename
+
+def custom_id_order(custom_id):
+    # Sorts custom_ids by their numbers, so "task-10" comes after "task-9"
+    return [int(part) if part.isdigit() else part for part in re.split(r'(\d+)', custom_id)]
+
+def read_results(filename, index=None, task_type=None):
+    # Reads a result file through mmap one line at a time and returns the answers in the order of
+    # index (the DataFrame index the tasks of task_type were created from), or by custom_id when no
+    # index is given. The batch API does not guarantee output order; rows without a result are None
+    answers = {}
+    with open(filename, 'rb') as file:
+        if os.fstat(file.fileno()).st_size:
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                for line in iter(mm.readline, b''):
+                    if not line.strip():
+                        continue
+                    try:
+                        res = loads(line)
+                        answers[res['custom_id']] = res['response']['body']['choices'][0]['message']['content']
+                    except (ValueError, KeyError, IndexError, TypeError) as e:
+                        print(f"Error parsing result: {e!r}")
+
+    if index is None:
+        return [answers[custom_id] for custom_id in sorted(answers, key=custom_id_order)]
+    return [answers.get(f"{task_type}-{label}") for label in index]
 
-def get_results(client, job_id):
+def get_results(client, job_id, index=None, task_type=None):
     batch_job = client.batches.retrieve(job_id)
-    result_file_id = batch_job.output_file_id
-    result = client.files.content(result_file_id).content
-    results = parse_json_objects(result)
-    answers = []
-    
-    for res in results:
-        result = res['response']['body']['choices'][0]['message']['content']
-        answers.append(result)
-    
-    return answers
\ No newline at end of file
+    filename = download_results(client, batch_job.output_file_id, f"batch_results_{job_id}.jsonl")
+    return read_results(filename, index, task_type)
+
+PACKING_PROMPT = (
+    "You will receive several texts, each starting with its number in square brackets. "
+    "Follow the instructions above for each text separately, and respond only with a JSON object "
+    'that maps each number to the answer for that text, e.g. {"1": "...", "2": "..."}.'
+)
+
+_encoding = None
+
+def count_tokens(text):
+    # cl100k_base token count, or about 4 characters per token when tiktoken is not installed
+    global _encoding
+    if _encoding is None:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        except ImportError:
+            _encoding = False
+    if not _encoding:
+        return len(text) // 4 + 1
+    return len(_encoding.encode(text, disallowed_special=()))
+
+def pack_rows(df, content_column, max_tokens=1000, max_rows=50):
+    # Groups consecutive rows into packs of at most max_rows rows whose numbered contents stay
+    # within max_tokens. A row that exceeds the budget on its own gets a pack to itself
+    packs, pack, pack_tokens = [], [], 0
+    for label, content in zip(df.index.tolist(), df[content_column].tolist()):
+        tokens = count_tokens(str(content)) + 4  # "[n] " prefix and newline
+        if pack and (pack_tokens + tokens > max_tokens or len(pack) >= max_rows):
+            packs.append(pack)
+            pack, pack_tokens = [], 0
+        pack.append(label)
+        pack_tokens += tokens
+    if pack:
+        packs.append(pack)
+    return packs
+
+def write_packed_tasks(file, df, packs, task_type, system_prompt, model, content_column, max_completion_tokens=100):
+    # Writes one task per pack, custom_id numbered by pack, asking for an answer per numbered row
+    contents = dict(zip(df.index.tolist(), df[content_column].tolist()))
+    for n, pack in enumerate(packs):
+        task = {
+            "custom_id": f"{task_type}-{n}",
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": {
+                "model": model,
+                "temperature": 0,
+                "max_completion_tokens": max_completion_tokens * len(pack),
+                "messages": [
+                    {"role": "system", "content": f"{system_prompt}\n\n{PACKING_PROMPT}"},
+                    {"role": "user", "content": "\n".join(f"[{i}] {contents[label]}" for i, label in enumerate(pack, 1))},
+                ],
+            }
+        }
+        file.write(dumps(task) + b'\n')
+    return len(packs)
+
+def save_packed_tasks(df, task_type, system_prompt, model, content_column, max_tokens=1000, max_rows=50):
+    packs = pack_rows(df, content_column, max_tokens, max_rows)
+    filename = f"batch_tasks_{task_type}.jsonl"
+    with open(filename, 'wb') as file:
+        write_packed_tasks(file, df, packs, task_type, system_prompt, model, content_column)
+    print(f"Packed {len(df)} rows into {len(packs)} requests, "
+          f"sending the system prompt {len(packs)} times instead of {len(df)}")
+    return filename, packs
+
+def unpack_answer(content, size):
+    # Returns the answers of a packed response in row order, or None if it can't be parsed
+    # or any row is missing
+    try:
+        answers = loads(content[content.index('{'):content.rindex('}') + 1])
+        return [str(answers[str(i)]) for i in range(1, size + 1)]
+    except (ValueError, KeyError, TypeError, AttributeError):
+        return None
+
+def get_packed_results(client, job_id, packs, task_type):
+    # Returns a dict of row label -> answer, and the labels of rows whose pack could not be unpacked
+    batch_job = client.batches.retrieve(job_id)
+    filename = download_results(client, batch_job.output_file_id, f"batch_results_{job_id}.jsonl")
+    answers, failed = {}, []
+    for pack, content in zip(packs, read_results(filename, range(len(packs)), task_type)):
+        unpacked = unpack_answer(content, len(pack))
+        if unpacked is None:
+            failed.extend(pack)
+        else:
+            answers.update(zip(pack, unpacked))
+    return answers, failed
+
+def run_packed_job(client, df, task_type, system_prompt, model, content_column, max_tokens=1000, max_rows=50):
+    # Runs a packed job, then resubmits the rows of packs that could not be unpacked as
+    # single-row requests. Returns the answers in the order of df
+    filename, packs = save_packed_tasks(df, task_type, system_prompt, model, content_column, max_tokens, max_rows)
+    job = create_batch_job(filename, client)
+    monitor_job_status(client, job.id, task_type)
+    answers, failed = get_packed_results(client, job.id, packs, task_type)
+
+    if failed:
+        print(f"{len(failed)} rows could not be unpacked, resubmitting them as single-row requests")
+        retry_type = f"{task_type}_retry"
+        filename = save_df_tasks(df.loc[failed], retry_type, system_prompt, model, content_column)
+        job = create_batch_job(filename, client)
+        monitor_job_status(client, job.id, retry_type)
+        answers.update(zip(failed, get_results(client, job.id, index=failed, task_type=retry_type)))
+
+    return [answers.get(label) for label in df.index.tolist()]
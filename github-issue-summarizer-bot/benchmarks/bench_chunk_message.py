@@ -0,0 +1,96 @@
+"""
+Compares the previous quadratic chunk_message with offset-based chunking and with
+packing summary fragments on large synthetic digests.
+
+Usage:
+    python benchmarks/bench_chunk_message.py --size-mb 10
+"""
+import argparse
+import itertools
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import main
+
+WORDS = "the build fails when running tests on windows after upgrading to version 2.3 see logs below".split()
+
+
+def chunk_message_quadratic(text: str, limit: int = 35000) -> list:
+    """
+    Previous implementation, copying the rest of the text after every chunk.
+    """
+    chunks = []
+    while text:
+        if len(text) <= limit:
+            chunks.append(text)
+            break
+        split_index = text[:limit].rfind('\n')
+        if split_index == -1:
+            split_index = limit
+        chunks.append(text[:split_index])
+        text = text[split_index:].lstrip()
+    return chunks
+
+
+def synthetic_summaries(size: int, rng: random.Random) -> dict:
+    repo_results = {}
+    total = 0
+    while total < size:
+        repo = f"repo-{rng.randrange(200)}"
+        summary = (
+            f"*Title:* <https://github.com/bench/{repo}/issues/{total}|[Issue {total}]>\n"
+            + " ".join(rng.choice(WORDS) for _ in range(rng.randint(30, 300)))
+            + "\n──────────────────────────────────────\n\n"
+        )
+        repo_results.setdefault(repo, []).append(summary)
+        total += len(summary)
+    return repo_results
+
+
+def main_bench():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--size-mb', type=float, default=10)
+    parser.add_argument('--limit', type=int, default=35000, help='Characters per message')
+    args = parser.parse_args()
+
+    repo_results = synthetic_summaries(int(args.size_mb * 1024 * 1024), random.Random(0))
+    header = main.format_report_header("bench")
+
+    # The previous process_and_post_results built the digest with repeated +=
+    start = time.perf_counter()
+    digest = header
+    for repo_name, summaries in repo_results.items():
+        digest += "".join(main.repo_section_fragments(repo_name, summaries))
+    build_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    quadratic = chunk_message_quadratic(digest, args.limit)
+    quadratic_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    linear = main.chunk_message(digest, args.limit)
+    linear_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    fragments = itertools.chain([header], itertools.chain.from_iterable(
+        main.repo_section_fragments(repo_name, summaries) for repo_name, summaries in repo_results.items()
+    ))
+    packed = list(main.pack_fragments(fragments, args.limit))
+    packed_time = time.perf_counter() - start
+
+    assert quadratic == linear
+    assert all(len(chunk) <= args.limit for chunk in linear + packed)
+    print(f"{len(digest) / 1024 / 1024:.1f} MB digest, {args.limit} characters per message")
+    print(f"Building the digest:  {build_time:.3f}s")
+    print(f"Quadratic chunking:   {quadratic_time:.3f}s, {len(quadratic)} messages")
+    print(f"Offset chunking:      {linear_time:.3f}s, {len(linear)} messages")
+    print(f"Fragment packing:     {packed_time:.3f}s, {len(packed)} messages (no digest built)")
+    print(f"Chunking speedup: {quadratic_time / linear_time:.1f}x")
+
+
+if __name__ == "__main__":
+    main_bench()
@@ -0,0 +1,72 @@
+"""
+Compares quadratic and incremental token budgeting of long comment threads.
+
+Usage:
+    python benchmarks/bench_comment_tokens.py --threads 5 --comments 500
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import main
+
+WORDS = "the build fails when running tests on windows after upgrading to version 2.3 see logs below".split()
+
+
+def join_comments_quadratic(comments: list, token_limit: int) -> str:
+    """
+    Previous implementation, re-encoding the whole joined text for every comment.
+    """
+    comments_text = ""
+    for comment in comments:
+        comment_body = comment.get("body", "")
+        if main.calculate_tokens(comments_text) + main.calculate_tokens(comment_body) > token_limit:
+            break
+        if comments_text:
+            comments_text += "\n---\n"
+        comments_text += comment_body
+    return comments_text
+
+
+def synthetic_thread(comment_count: int, rng: random.Random) -> list:
+    return [
+        {"body": " ".join(rng.choice(WORDS) for _ in range(rng.randint(20, 200)))}
+        for _ in range(comment_count)
+    ]
+
+
+def time_call(func, threads: list, token_limit: int) -> tuple:
+    start = time.perf_counter()
+    outputs = [func(thread, token_limit) for thread in threads]
+    return time.perf_counter() - start, outputs
+
+
+def main_bench():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--threads', type=int, default=5)
+    parser.add_argument('--comments', type=int, default=500, help='Comments per thread')
+    parser.add_argument('--token-limit', type=int, default=100000)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    threads = [synthetic_thread(args.comments, rng) for _ in range(args.threads)]
+
+    quadratic_time, quadratic = time_call(join_comments_quadratic, threads, args.token_limit)
+    incremental_time, incremental = time_call(main.join_comments, threads, args.token_limit)
+
+    total = sum(main.calculate_tokens(text) for text in incremental)
+    print(f"{args.threads} threads x {args.comments} comments, {total} tokens kept")
+    print(f"Quadratic:   {quadratic_time:.3f}s")
+    print(f"Incremental: {incremental_time:.3f}s")
+    print(f"Speedup: {quadratic_time / incremental_time:.1f}x")
+    # The quadratic version ignores the separator before each new comment, so it may keep more
+    if quadratic != incremental:
+        print("Note: outputs differ only where the old budget undercounted '---' separators")
+
+
+if __name__ == "__main__":
+    main_bench()
@@ -0,0 +1,135 @@
+"""
+Runs the whole bot end to end against local fakes of GitHub, the kluster.ai batch API and Slack.
+
+Each corpus size runs main.py in a fresh interpreter and working directory, pointed at the
+fakes through the base_url settings. It reports throughput, peak memory and the stage
+times from the run metrics. The tokenizer is loaded from TIKTOKEN_CACHE_DIR, so warm the
+cache once with `python main.py --warm-tokenizer-cache` to run without network access.
+
+Usage:
+    python benchmarks/bench_end_to_end.py --sizes 10,1000,100000 --latency 0.01
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from fakes import FakeBatchAPI, FakeGitHub, FakeSlack
+
+MAIN = Path(__file__).resolve().parent.parent / "main.py"
+STAGES = [
+    "fetch_repos", "fetch_issues", "comments", "prepare", "upload", "monitor", "download", "merge", "post", "archive"
+]
+
+
+def write_config(path: Path, github: FakeGitHub, batch: FakeBatchAPI, slack: FakeSlack, args) -> None:
+    config = {
+        "api": {
+            "github": {"owner": "bench", "base_url": github.base_url, "fetch_backend": args.backend},
+            "klusterai": {"base_url": f"{batch.base_url}/v1"},
+            "slack": {"channel": "bench", "base_url": slack.base_url, "threads": args.threads},
+        },
+        "processing": {
+            "batch": {
+                "poll_min_seconds": 0.1,
+                "poll_max_seconds": 1,
+                "stream_results": args.stream,
+            },
+            "concurrency": {"github_workers": args.workers},
+            "cache": {"enabled": False},
+            "http_cache": {"enabled": False},
+            "rate_limit": {"backoff_seconds": 0.05},
+        },
+        "runtime": {"debug": False},
+    }
+    # JSON is valid YAML
+    path.write_text(json.dumps(config))
+
+
+def run(cwd: str, env: dict) -> tuple:
+    """
+    Runs main.py and returns its wall time, exit code and peak resident memory in MB.
+    """
+    with open(Path(cwd) / "output.log", "w") as log:
+        start = time.perf_counter()
+        process = subprocess.Popen([sys.executable, str(MAIN), "--config", "config.yaml"],
+                                   cwd=cwd, env=env, stdout=log, stderr=subprocess.STDOUT)
+        _, status, usage = os.wait4(process.pid, 0)
+        elapsed = time.perf_counter() - start
+    process.returncode = os.waitstatus_to_exitcode(status)
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    peak_mb = usage.ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+    return elapsed, process.returncode, peak_mb
+
+
+def bench_size(size: int, args) -> dict:
+    repos = -(-size // args.issues_per_repo)
+    with tempfile.TemporaryDirectory() as tmp, \
+            FakeGitHub(repos, -(-size // repos), args.comments, args.latency, throttle=args.throttle,
+                       body_words=args.body_words, comment_words=args.comment_words) as github, \
+            FakeBatchAPI(args.latency, args.batch_queue, args.batch_rate, args.partial,
+                         fail_requests=args.fail_requests) as batch, \
+            FakeSlack(args.latency, args.slack_rate_limit) as slack:
+        write_config(Path(tmp, "config.yaml"), github, batch, slack, args)
+        env = {**os.environ, "KLUSTERAI_API_KEY": "bench", "GH_TOKEN": "bench", "SLACK_TOKEN": "bench"}
+        elapsed, returncode, peak_mb = run(tmp, env)
+        if returncode != 0 or not (slack.messages or args.fail_requests):
+            sys.exit(f"Run with {size} issues failed:\n{Path(tmp, 'output.log').read_text()[-5000:]}")
+        metrics = json.loads(Path(tmp, "config.metrics.jsonl").read_text().splitlines()[-1])
+        return {
+            "issues": sum(len(issues) for issues in github.issues.values()),
+            "seconds": elapsed,
+            "peak_mb": peak_mb,
+            "github_requests": github.request_count,
+            "batch_requests": batch.request_count,
+            "uploaded_mb": batch.uploaded_bytes / 1024 / 1024,
+            "slack_messages": len(slack.messages),
+            "stages": metrics["stages"],
+        }
+
+
+def main_bench():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--sizes', default='10,1000,100000', help='Comma separated issue counts')
+    parser.add_argument('--issues-per-repo', type=int, default=500)
+    parser.add_argument('--comments', type=int, default=2, help='Comments per issue')
+    parser.add_argument('--body-words', type=int, default=150)
+    parser.add_argument('--comment-words', type=int, default=40)
+    parser.add_argument('--backend', choices=['rest', 'graphql'], default='rest')
+    parser.add_argument('--workers', type=int, default=8, help='GitHub workers')
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds per request to each fake')
+    parser.add_argument('--throttle', type=float, default=0.0, help='Fraction of GitHub requests rate limited')
+    parser.add_argument('--batch-queue', type=float, default=1.0, help='Seconds before a batch starts')
+    parser.add_argument('--batch-rate', type=float, default=5000, help='Batch tasks completed per second')
+    parser.add_argument('--partial', action='store_true', help='Expose partial output of running batches')
+    parser.add_argument('--fail-requests', type=float, default=0.0, help='Fraction of batch tasks that fail')
+    parser.add_argument('--stream', action='store_true', help='Post summaries while batches run')
+    parser.add_argument('--threads', action='store_true', help='Post one Slack thread per repository')
+    parser.add_argument('--slack-rate-limit', type=int, default=None, help='Slack messages per second')
+    args = parser.parse_args()
+
+    results = []
+    for size in [int(size) for size in args.sizes.split(',')]:
+        print(f"Running {size} issues...", flush=True)
+        results.append(bench_size(size, args))
+
+    print(f"\n{'issues':>8} {'seconds':>8} {'issues/s':>9} {'peak MB':>8} {'GitHub':>7} {'batch':>6} "
+          f"{'upload MB':>9} {'Slack':>6}")
+    for result in results:
+        print(f"{result['issues']:>8} {result['seconds']:>8.2f} {result['issues'] / result['seconds']:>9.1f} "
+              f"{result['peak_mb']:>8.1f} {result['github_requests']:>7} {result['batch_requests']:>6} "
+              f"{result['uploaded_mb']:>9.2f} {result['slack_messages']:>6}")
+
+    print(f"\nStage seconds\n{'issues':>8} " + " ".join(f"{stage:>12}" for stage in STAGES))
+    for result in results:
+        print(f"{result['issues']:>8} " + " ".join(
+            f"{result['stages'].get(stage, {}).get('seconds', 0):>12.2f}" for stage in STAGES
+        ))
+
+
+if __name__ == "__main__":
+    main_bench()
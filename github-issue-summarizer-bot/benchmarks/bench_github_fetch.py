@@ -0,0 +1,55 @@
+"""
+Compares sequential and concurrent GitHub issue fetching against a local fake server.
+
+Usage:
+    python benchmarks/bench_github_fetch.py --repos 50 --issues 90 --latency 0.02
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import main
+from fakes import FakeGitHub
+
+
+def run(base_url: str, workers: int, last_run_file: Path) -> tuple:
+    config = {
+        'api': {'github': {'base_url': base_url, 'fetch_backend': 'rest'}},
+        'processing': {
+            'concurrency': {'github_workers': workers},
+            'rate_limit': {'backoff_seconds': 0.05},
+            'history': {'use_last_run_file': False, 'default_lookback_hours': 24},
+        },
+    }
+    start = time.perf_counter()
+    session = main.create_github_session("token", workers, rate_limit=config['processing']['rate_limit'])
+    issues = main.fetch_github_issues("token", "bench", None, last_run_file, config, session)
+    return time.perf_counter() - start, issues
+
+
+def main_bench():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--repos', type=int, default=50)
+    parser.add_argument('--issues', type=int, default=90, help='Issues per repository')
+    parser.add_argument('--latency', type=float, default=0.02, help='Seconds per request')
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--throttle', type=float, default=0.0,
+                        help='Fraction of requests answered with 429/403 rate limit errors')
+    args = parser.parse_args()
+
+    with FakeGitHub(args.repos, args.issues, latency=args.latency, throttle=args.throttle) as fake:
+        last_run_file = Path("bench.last_run")
+        sequential_time, sequential = run(fake.base_url, 1, last_run_file)
+        concurrent_time, concurrent = run(fake.base_url, args.workers, last_run_file)
+
+    assert [i['html_url'] for i in sequential] == [i['html_url'] for i in concurrent]
+    print(f"\nSequential (1 worker):  {sequential_time:.2f}s for {len(sequential)} issues")
+    print(f"Concurrent ({args.workers} workers): {concurrent_time:.2f}s for {len(concurrent)} issues")
+    print(f"Speedup: {sequential_time / concurrent_time:.1f}x")
+
+
+if __name__ == "__main__":
+    main_bench()
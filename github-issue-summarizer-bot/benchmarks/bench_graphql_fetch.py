@@ -0,0 +1,68 @@
+"""
+Compares request counts of the REST and GraphQL fetch backends for issues plus comments,
+and checks that both return the same open issues and PRs.
+
+Usage:
+    python benchmarks/bench_graphql_fetch.py --repos 50 --issues 40 --comments 5
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import main
+from fakes import FakeGitHub
+
+
+def run(fake: FakeGitHub, backend: str, workers: int) -> tuple:
+    config = {
+        'api': {'github': {
+            'base_url': fake.base_url,
+            'fetch_backend': backend,
+            'graphql_repos_per_query': 10,
+            'graphql_page_size': 50,
+            'graphql_comments_per_issue': 30,
+        }},
+        'processing': {
+            'concurrency': {'github_workers': workers},
+            'history': {'use_last_run_file': False, 'default_lookback_hours': 24},
+        },
+    }
+    fake.request_count = 0
+    start = time.perf_counter()
+    session = main.create_github_session("token", workers)
+    issues = main.fetch_github_issues("token", "bench", None, Path("bench.last_run"), config, session)
+    issues = main.process_issues_content(issues, 100000, session, workers)
+    return time.perf_counter() - start, fake.request_count, issues
+
+
+def main_bench():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--repos', type=int, default=50)
+    parser.add_argument('--issues', type=int, default=40, help='Issues per repository')
+    parser.add_argument('--comments', type=int, default=5, help='Comments per issue')
+    parser.add_argument('--prs', type=int, default=10, help='PRs per repository')
+    parser.add_argument('--closed', type=float, default=0.2, help='Fraction of closed issues and PRs')
+    parser.add_argument('--latency', type=float, default=0.02, help='Seconds per request')
+    parser.add_argument('--workers', type=int, default=8)
+    args = parser.parse_args()
+
+    with FakeGitHub(args.repos, args.issues, args.comments, latency=args.latency,
+                    prs_per_repo=args.prs, closed_fraction=args.closed) as fake:
+        rest_time, rest_requests, rest = run(fake, 'rest', args.workers)
+        graphql_time, graphql_requests, graphql = run(fake, 'graphql', args.workers)
+
+        open_items = {item['html_url'] for items in fake.issues.values() for item in items if item['state'] == 'open'}
+
+    key = lambda issue: (issue['html_url'], issue.get('comments_text'))
+    assert sorted(map(key, rest)) == sorted(map(key, graphql))
+    assert {issue['html_url'] for issue in rest} == open_items
+    print(f"\nREST:    {rest_requests} requests, {rest_time:.2f}s for {len(rest)} issues")
+    print(f"GraphQL: {graphql_requests} requests, {graphql_time:.2f}s for {len(graphql)} issues")
+    print(f"Request reduction: {rest_requests / graphql_requests:.1f}x")
+
+
+if __name__ == "__main__":
+    main_bench()
@@ -0,0 +1,246 @@
+"""
+Kills the bot at several points of a run and restarts it against local fakes of GitHub, the batch API and Slack.
+
+Each scenario starts main.py in a fresh working directory, sends it SIGKILL as soon as
+the run reaches the scenario's kill point and runs it again until it completes. The
+restarted run has to resume from its journal: it sends no GitHub request, submits no
+batch job a second time, posts every summary and reposts at most the Slack messages
+that were in flight when the process was killed. Afterwards aiter_finished_batches is
+run against the fake batch API with a synchronous and an asynchronous client, and every
+job has to be yielded exactly once, in the order the jobs finish.
+
+Usage:
+    python benchmarks/bench_resume.py --issues 200 --repos 10 --slack-latency 0.02
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import re
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import main
+from fakes import FakeBatchAPI, FakeGitHub, FakeSlack
+
+MAIN = Path(__file__).resolve().parent.parent / "main.py"
+
+
+def shard_count(github: FakeGitHub, args) -> int:
+    return -(-sum(len(repo_issues) for repo_issues in github.issues.values()) // args.shard_requests)
+
+
+# name, stream_results, threads, kill point. A kill point gets the fakes, the stages in
+# the run journal so far and the arguments. The monitor scenario waits until every shard
+# is journaled as submitted, so no job can be created but not yet journaled when it is
+# killed. Such a job would be submitted again.
+SCENARIOS = [
+    ("monitor", False, False, lambda fakes, stages, args: stages.count("submitted") == shard_count(fakes["github"], args)),
+    ("post", False, False, lambda fakes, stages, args: len(fakes["slack"].messages) >= 2),
+    ("thread parents", False, True, lambda fakes, stages, args: len(fakes["slack"].messages) >= args.repos // 2),
+    ("thread replies", False, True, lambda fakes, stages, args: len(fakes["slack"].messages) >= args.repos + 3),
+    ("stream threads", True, True, lambda fakes, stages, args: len(fakes["slack"].messages) >= 3),
+]
+
+
+def write_config(path: Path, fakes: dict, stream: bool, threads: bool, args) -> None:
+    config = {
+        "api": {
+            "github": {"owner": "bench", "base_url": fakes["github"].base_url},
+            "klusterai": {"base_url": f"{fakes['batch'].base_url}/v1"},
+            "slack": {
+                "channel": "bench",
+                "base_url": fakes["slack"].base_url,
+                "threads": threads,
+                "post_workers": args.post_workers,
+            },
+        },
+        "processing": {
+            "batch": {
+                "poll_min_seconds": 0.1,
+                "poll_max_seconds": 0.5,
+                "stream_results": stream,
+                "shard_max_requests": args.shard_requests,
+            },
+            "cache": {"enabled": False},
+            "http_cache": {"enabled": False},
+            "rate_limit": {"backoff_seconds": 0.05},
+        },
+        "runtime": {"debug": False},
+    }
+    # JSON is valid YAML
+    path.write_text(json.dumps(config))
+
+
+def start(cwd: str, env: dict, log_name: str) -> subprocess.Popen:
+    with open(Path(cwd) / log_name, "w") as log:
+        return subprocess.Popen([sys.executable, str(MAIN), "--config", "config.yaml"],
+                                cwd=cwd, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+
+def journal_stages(cwd: str) -> list:
+    stages = []
+    for path in Path(cwd, "batch_files").glob(f"*/{main.RunJournal.FILE_NAME}"):
+        # A line still being written is cut off, it is picked up on the next check
+        stages.extend(json.loads(line)["stage"] for line in path.read_text().splitlines(keepends=True)
+                      if line.endswith("\n"))
+    return stages
+
+
+def check_slack(slack: FakeSlack, issues: int, threads: bool) -> tuple:
+    """
+    Returns the number of missing summaries and of messages posted more than once.
+    """
+    summaries = Counter(
+        custom_id for message in slack.messages
+        for custom_id in re.findall(r"Summary of (issue-\d+)\.", message.get("text", ""))
+    )
+    missing = sum(1 for i in range(1, issues + 1) if summaries[f"issue-{i}"] == 0)
+    repeated = Counter(
+        (message.get("text"), message.get("thread_ts") is not None) for message in slack.messages
+    )
+    duplicates = sum(count - 1 for count in repeated.values())
+    if threads:
+        # Replies that lost their parent would point at a top-level message posted twice
+        parents = {message["ts"] for message in slack.messages if "thread_ts" not in message}
+        missing += sum(1 for message in slack.messages if message.get("thread_ts", message["ts"]) not in parents)
+    return missing, duplicates
+
+
+def run_scenario(name: str, stream: bool, threads: bool, kill_point, args) -> dict:
+    with tempfile.TemporaryDirectory() as tmp, \
+            FakeGitHub(args.repos, -(-args.issues // args.repos), 1, body_words=40, comment_words=20) as github, \
+            FakeBatchAPI(queue_seconds=args.batch_queue, requests_per_second=args.batch_rate,
+                         partial_output=stream) as batch, \
+            FakeSlack(args.slack_latency) as slack:
+        fakes = {"github": github, "batch": batch, "slack": slack}
+        write_config(Path(tmp, "config.yaml"), fakes, stream, threads, args)
+        env = {**os.environ, "KLUSTERAI_API_KEY": "bench", "GH_TOKEN": "bench", "SLACK_TOKEN": "bench"}
+        issues = sum(len(repo_issues) for repo_issues in github.issues.values())
+
+        started = time.perf_counter()
+        process = start(tmp, env, "first.log")
+        while process.poll() is None and not kill_point(fakes, journal_stages(tmp), args):
+            time.sleep(0.005)
+        if process.poll() is not None:
+            sys.exit(f"Scenario '{name}' finished before its kill point:\n{Path(tmp, 'first.log').read_text()[-3000:]}")
+        os.kill(process.pid, signal.SIGKILL)
+        process.wait()
+        killed_after = time.perf_counter() - started
+        github_requests = github.request_count
+        batches = len(batch.batches)
+        slack_messages = len(slack.messages)
+
+        started = time.perf_counter()
+        process = start(tmp, env, "resume.log")
+        returncode = process.wait()
+        resume_seconds = time.perf_counter() - started
+        output = Path(tmp, "resume.log").read_text()
+        if returncode != 0 or "Resuming interrupted run" not in output:
+            sys.exit(f"Scenario '{name}' did not resume:\n{output[-3000:]}")
+
+        missing, duplicates = check_slack(slack, issues, threads)
+        result = {
+            "scenario": name,
+            "killed_after": killed_after,
+            "resume_seconds": resume_seconds,
+            "github_requests": github.request_count - github_requests,
+            "batches_before": batches,
+            "batches": len(batch.batches),
+            "shards": shard_count(github, args),
+            "slack_before": slack_messages,
+            "slack": len(slack.messages),
+            "missing": missing,
+            "duplicates": duplicates,
+        }
+        # Only messages in flight at the kill can have been posted without being journaled
+        in_flight = args.post_workers if threads else 1
+        assert result["github_requests"] == 0, f"{name}: resumed run fetched from GitHub again"
+        assert result["batches"] == result["shards"], f"{name}: batch jobs were submitted again"
+        assert missing == 0, f"{name}: {missing} summaries missing from Slack"
+        assert duplicates <= in_flight, f"{name}: {duplicates} Slack messages posted twice"
+        return result
+
+
+def submit_jobs(client, jobs: int, tasks: int) -> list:
+    """
+    Submits jobs of growing size, so they finish one after the other.
+    """
+    batch_ids = []
+    for job in range(jobs):
+        lines = "".join(
+            json.dumps({"custom_id": f"issue-{i + 1}", "method": "POST", "url": "/v1/chat/completions",
+                        "body": {"model": "bench", "messages": []}}) + "\n"
+            for i in range(tasks * (job + 1))
+        )
+        input_file = client.files.create(file=(f"batch_input_{job:03d}.jsonl", lines.encode()), purpose="batch")
+        batch_ids.append(client.batches.create(
+            input_file_id=input_file.id, endpoint="/v1/chat/completions", completion_window="24h"
+        ).id)
+    return batch_ids
+
+
+async def collect_finished(client, batch_ids: list) -> list:
+    return [batch_status.id async for batch_status in main.aiter_finished_batches(client, batch_ids, 0.05, 0.5)]
+
+
+def bench_async_monitor(args) -> list:
+    from openai import AsyncOpenAI, OpenAI
+
+    results = []
+    for client_class in (OpenAI, AsyncOpenAI):
+        with FakeBatchAPI(queue_seconds=0.2, requests_per_second=args.batch_rate) as batch:
+            client = OpenAI(api_key="bench", base_url=f"{batch.base_url}/v1")
+            batch_ids = submit_jobs(client, args.jobs, args.job_tasks)
+            monitor_client = client_class(api_key="bench", base_url=f"{batch.base_url}/v1")
+            started = time.perf_counter()
+            # Keep the per-poll status lines out of the report
+            with contextlib.redirect_stdout(io.StringIO()):
+                finished = asyncio.run(collect_finished(monitor_client, batch_ids))
+            seconds = time.perf_counter() - started
+            assert finished == batch_ids, f"{client_class.__name__}: jobs yielded as {finished}"
+            results.append((client_class.__name__, seconds, batch.request_count))
+    return results
+
+
+def main_bench():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--issues', type=int, default=200)
+    parser.add_argument('--repos', type=int, default=10)
+    parser.add_argument('--shard-requests', type=int, default=50, help='Requests per batch shard')
+    parser.add_argument('--batch-queue', type=float, default=1.0, help='Seconds before a batch starts')
+    parser.add_argument('--batch-rate', type=float, default=200, help='Batch tasks completed per second')
+    parser.add_argument('--slack-latency', type=float, default=0.02, help='Seconds per Slack message')
+    parser.add_argument('--post-workers', type=int, default=4, help='Slack threads posted concurrently')
+    parser.add_argument('--jobs', type=int, default=4, help='Batch jobs watched by aiter_finished_batches')
+    parser.add_argument('--job-tasks', type=int, default=100, help='Tasks in the smallest of those jobs')
+    args = parser.parse_args()
+
+    results = []
+    for name, stream, threads, kill_point in SCENARIOS:
+        print(f"Running scenario '{name}'...", flush=True)
+        results.append(run_scenario(name, stream, threads, kill_point, args))
+
+    print(f"\n{'scenario':<16} {'killed at':>9} {'resume s':>9} {'GitHub':>7} {'batches':>8} "
+          f"{'Slack before':>12} {'Slack':>6} {'reposted':>8}")
+    for result in results:
+        print(f"{result['scenario']:<16} {result['killed_after']:>8.2f}s {result['resume_seconds']:>9.2f} "
+              f"{result['github_requests']:>7} {result['batches_before']:>3}/{result['batches']:<4} "
+              f"{result['slack_before']:>12} {result['slack']:>6} {result['duplicates']:>8}")
+
+    print(f"\naiter_finished_batches over {args.jobs} jobs")
+    for client_name, seconds, requests in bench_async_monitor(args):
+        print(f"{client_name:<12} {seconds:>6.2f}s {requests:>5} requests")
+
+
+if __name__ == "__main__":
+    main_bench()
@@ -0,0 +1,70 @@
+"""
+Compares Slack report delivery with the previous fixed 10 second pause between chunks
+against paced channel and threaded delivery, using a local fake Slack endpoint.
+
+Usage:
+    python benchmarks/bench_slack_delivery.py --repos 20 --summaries 40 --latency 0.05
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import main
+from fakes import FakeSlack
+
+
+def build_report(repos: int, summaries: int) -> dict:
+    return {
+        f"repo-{r}": [
+            f"*Title:* <https://github.com/bench/repo-{r}/issues/{i}|[Issue {i}]>\n"
+            + "Synthetic summary text. " * 40
+            + "\n──────────────────────────────────────\n\n"
+            for i in range(summaries)
+        ]
+        for r in range(repos)
+    }
+
+
+def run(base_url: str, report: dict, threads: bool, workers: int) -> float:
+    slack = main.SlackReporter("bench", "token", base_url, threads=threads, max_workers=workers,
+                               rate_limit={'backoff_seconds': 0.05})
+    start = time.perf_counter()
+    assert slack.post_report(main.format_report_header("bench"), report)
+    return time.perf_counter() - start
+
+
+def main_bench():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--repos', type=int, default=20)
+    parser.add_argument('--summaries', type=int, default=40, help='Summaries per repository')
+    parser.add_argument('--latency', type=float, default=0.05, help='Seconds per request')
+    parser.add_argument('--rate-limit', type=int, default=None, help='Messages per second accepted by the fake')
+    parser.add_argument('--workers', type=int, default=4)
+    args = parser.parse_args()
+
+    report = build_report(args.repos, args.summaries)
+    combined = main.format_report_header("bench") + "".join(
+        "".join(main.repo_section_fragments(repo, summaries)) for repo, summaries in report.items()
+    )
+    legacy_chunks = len(main.chunk_message(combined))
+    # The previous post_to_slack slept 10 seconds between chunks and opened a connection per post
+    legacy_time = legacy_chunks * args.latency + (legacy_chunks - 1) * 10
+
+    with FakeSlack(args.latency, args.rate_limit) as fake:
+        channel_time = run(fake.base_url, report, False, args.workers)
+        channel_messages = len(fake.messages)
+        threaded_time = run(fake.base_url, report, True, args.workers)
+        threaded_messages = len(fake.messages) - channel_messages
+        throttled = fake.throttled_count
+
+    print(f"\nPrevious delivery (estimated): {legacy_time:.2f}s for {legacy_chunks} messages")
+    print(f"Paced channel delivery:        {channel_time:.2f}s for {channel_messages} messages")
+    print(f"Threaded delivery ({args.workers} workers): {threaded_time:.2f}s for {threaded_messages} messages")
+    print(f"Rate limited answers: {throttled}")
+
+
+if __name__ == "__main__":
+    main_bench()
@@ -0,0 +1,76 @@
+"""
+Measures the wall time of short bot invocations against a startup time budget.
+
+Each scenario runs main.py in a fresh interpreter: --help, a configuration error and a
+run that finds no new issues on a fake GitHub API. The tokenizer cache points at an
+empty directory, so a scenario that loads the tokenizer needs network access to finish.
+
+Usage:
+    python benchmarks/bench_startup.py --budget 1.0 --repeat 5
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from fakes import FakeGitHub
+
+MAIN = Path(__file__).resolve().parent.parent / "main.py"
+
+
+def run(args: list, cwd: str, env: dict) -> tuple:
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, str(MAIN), *args], cwd=cwd, env=env, capture_output=True, text=True)
+    return time.perf_counter() - start, result
+
+
+def main_bench():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--budget', type=float, default=1.0, help='Seconds allowed per invocation')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--repos', type=int, default=20, help='Repositories checked by the empty run')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp, FakeGitHub(args.repos, 0) as fake:
+        env = {
+            **os.environ,
+            "KLUSTERAI_API_KEY": "bench",
+            "GH_TOKEN": "bench",
+            "SLACK_TOKEN": "bench",
+            "TIKTOKEN_CACHE_DIR": str(Path(tmp) / "empty_tiktoken_cache"),
+        }
+        Path(tmp, "invalid.yaml").write_text("api:\n  github:\n    owner: bench\n")
+        Path(tmp, "empty.yaml").write_text(
+            "api:\n"
+            f"  github: {{owner: bench, base_url: '{fake.base_url}'}}\n"
+            "  slack: {channel: bench}\n"
+            "runtime: {debug: true}\n"
+        )
+        scenarios = {
+            "--help": (["--help"], "usage:"),
+            "configuration error": (["--config", "invalid.yaml"], "Configuration error"),
+            "no new issues": (["--config", "empty.yaml"], "No new updates to report"),
+        }
+
+        over_budget = False
+        print(f"Startup budget: {args.budget:.2f}s, median of {args.repeat} runs")
+        for name, (scenario_args, expected) in scenarios.items():
+            times = []
+            for _ in range(args.repeat):
+                elapsed, result = run(scenario_args, tmp, env)
+                if expected not in result.stdout:
+                    sys.exit(f"{name} did not print {expected!r}:\n{result.stdout}{result.stderr}")
+                times.append(elapsed)
+            median = statistics.median(times)
+            over_budget |= median > args.budget
+            print(f"{name:<22} {median:.3f}s {'OK' if median <= args.budget else 'OVER BUDGET'}")
+
+    sys.exit(1 if over_budget else 0)
+
+
+if __name__ == "__main__":
+    main_bench()
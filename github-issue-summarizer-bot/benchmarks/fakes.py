@@ -0,0 +1,670 @@
+"""
+In-process fake HTTP servers used by the benchmarks.
+"""
+import gzip
+import hashlib
+import json
+import random
+import re
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from email.parser import BytesParser
+from email.policy import default
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+WORDS = (
+    "the error crash when build fails on startup after upgrade config token request timeout "
+    "memory leak slow response thread worker queue retry cache invalid missing field value "
+    "expected actual version release test flaky linux windows macos python install package"
+).split()
+
+
+def synthetic_text(rng: random.Random, words: int) -> str:
+    """
+    Returns a paragraph break followed by words of issue-like filler text, or an empty
+    string for no words.
+    """
+    chosen = rng.choices(WORDS, k=words)
+    return "".join("\n\n" + " ".join(chosen[i:i + 20]) for i in range(0, words, 20))
+
+
+class QuietHTTPServer(ThreadingHTTPServer):
+    def handle_error(self, request, client_address):
+        # Clients that are killed or time out mid-request are part of some benchmarks
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+class FakeServer:
+    """
+    Runs a handler class on a local ThreadingHTTPServer in a background thread.
+    """
+
+    def __init__(self, handler_class):
+        self.httpd = QuietHTTPServer(("127.0.0.1", 0), handler_class)
+        self.httpd.daemon_threads = True
+        self.httpd.fake = self
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class FakeHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body are written separately, Nagle's algorithm would hold back the body
+    # until the client's delayed ACK and add 40ms to every keep-alive response
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    @property
+    def fake(self):
+        return self.server.fake
+
+    def read_body(self) -> bytes:
+        if self.headers.get("Transfer-Encoding", "").lower() != "chunked":
+            length = int(self.headers.get("Content-Length", 0))
+            body = self.rfile.read(length)
+            if len(body) < length:
+                raise ConnectionResetError("Client closed the connection mid-request")
+            return body
+        chunks = []
+        while True:
+            size = int(self.rfile.readline().split(b";")[0], 16)
+            chunks.append(self.rfile.read(size))
+            self.rfile.readline()
+            if size == 0:
+                return b"".join(chunks)
+
+    def send_bytes(self, body: bytes, content_type: str = "application/octet-stream"):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_json(self, payload, status: int = 200, headers: dict = None):
+        body = json.dumps(payload).encode()
+        headers = {**getattr(self.fake, "rate_limit_headers", dict)(), **(headers or {})}
+        if status == 200 and getattr(self.fake, "etags", False):
+            etag = f'"{hashlib.sha1(body).hexdigest()}"'
+            headers = {**(headers or {}), "ETag": etag}
+            if self.headers.get("If-None-Match") == etag:
+                self.fake.not_modified_count += 1
+                self.send_response(304)
+                self.send_header("Content-Length", "0")
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                return
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class FakeGitHubHandler(FakeHandler):
+    def do_GET(self):
+        fake = self.fake
+        time.sleep(fake.latency)
+        with fake.lock:
+            fake.request_count += 1
+            throttled = fake.rng.random() < fake.throttle
+            if throttled:
+                fake.throttled_count += 1
+
+        if throttled:
+            # Alternate between a 429 with Retry-After and a secondary rate limit 403
+            if fake.throttled_count % 2:
+                return self.send_json({"message": "Too Many Requests"}, status=429, headers={"Retry-After": "0"})
+            return self.send_json(
+                {"message": "You have exceeded a secondary rate limit. Please wait a few minutes."},
+                status=403
+            )
+
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        parts = url.path.strip("/").split("/")
+
+        if parts == ["user"]:
+            return self.send_json({"login": "bench"})
+        if len(parts) == 3 and parts[0] == "orgs" and parts[2] == "repos":
+            items = [{"name": name} for name in fake.repos]
+            return self.send_page(url.path, query, items, default_per_page=30)
+        if len(parts) == 4 and parts[0] == "repos" and parts[3] == "issues":
+            issues = fake.issues_since(parts[2], query.get("since", [None])[0])
+            state = query.get("state", ["open"])[0]
+            if state != "all":
+                issues = [issue for issue in issues if issue["state"] == state]
+            return self.send_page(url.path, query, issues, default_per_page=30)
+        if len(parts) == 5 and parts[0] == "repos" and parts[3] == "issues":
+            return self.send_json([])
+        if len(parts) == 6 and parts[0] == "repos" and parts[5] == "comments":
+            return self.send_json(fake.comments.get((parts[2], int(parts[4])), []))
+        self.send_json({"message": "Not Found"}, status=404)
+
+    def do_POST(self):
+        fake = self.fake
+        time.sleep(fake.latency)
+        with fake.lock:
+            fake.request_count += 1
+        body = json.loads(self.read_body())
+        if urlparse(self.path).path != "/graphql":
+            return self.send_json({"message": "Not Found"}, status=404)
+        self.send_json({"data": fake.answer_graphql(body["query"], body["variables"])})
+
+    def send_page(self, path: str, query: dict, items: list, default_per_page: int):
+        page = int(query.get("page", ["1"])[0])
+        per_page = min(int(query.get("per_page", [str(default_per_page)])[0]), self.fake.max_per_page)
+        last_page = max(1, -(-len(items) // per_page))
+        headers = {}
+        if self.fake.link_headers and last_page > 1:
+            base = f"{self.fake.base_url}{path}?per_page={per_page}"
+            links = []
+            if page < last_page:
+                links.append(f'<{base}&page={page + 1}>; rel="next"')
+            links.append(f'<{base}&page={last_page}>; rel="last"')
+            headers["Link"] = ", ".join(links)
+        start = (page - 1) * per_page
+        self.send_json(items[start:start + per_page], headers=headers)
+
+
+class FakeGitHub(FakeServer):
+    """
+    Fake GitHub REST API serving an organization with synthetic repos, issues, PRs and comments.
+
+    Like GitHub, the REST issues listing includes PRs and only serves open items unless
+    asked for state=closed or state=all, and the GraphQL connections filter on states.
+
+    Args:
+        repo_count: Number of repositories in the organization
+        issues_per_repo: Number of issues returned for each repository
+        comments_per_issue: Number of comments on each issue
+        latency: Seconds to sleep before answering each request
+        link_headers: Whether to advertise pagination through Link headers
+        etags: Whether to send ETags and answer If-None-Match with 304 Not Modified
+        throttle: Fraction of requests answered with a 429 or secondary rate limit 403
+        rate_limit: Requests allowed per rate_limit_window seconds, reported in
+            X-RateLimit-* headers (None to omit the headers)
+        rate_limit_window: Length of the rate limit window in seconds
+        max_per_page: Largest page size served, larger per_page values are capped
+        body_words: Words of synthetic text in each issue body (0 for a one-line body)
+        comment_words: Words of synthetic text in each comment (0 for a one-line comment)
+        prs_per_repo: Number of PRs in each repository, numbered after its issues
+        closed_fraction: Fraction of issues and PRs that are closed
+    """
+
+    def __init__(
+        self,
+        repo_count: int = 10,
+        issues_per_repo: int = 10,
+        comments_per_issue: int = 0,
+        latency: float = 0.0,
+        link_headers: bool = True,
+        etags: bool = True,
+        throttle: float = 0.0,
+        rate_limit: int = None,
+        rate_limit_window: float = 60.0,
+        max_per_page: int = 100,
+        body_words: int = 0,
+        comment_words: int = 0,
+        prs_per_repo: int = 0,
+        closed_fraction: float = 0.0
+    ):
+        super().__init__(FakeGitHubHandler)
+        self.latency = latency
+        self.max_per_page = max_per_page
+        self.link_headers = link_headers
+        self.etags = etags
+        self.not_modified_count = 0
+        self.throttle = throttle
+        self.throttled_count = 0
+        self.rng = random.Random(0)
+        self.rate_limit = rate_limit
+        self.rate_limit_window = rate_limit_window
+        self.window_start = time.time()
+        self.window_start_count = 0
+        self.lock = threading.Lock()
+        self.request_count = 0
+        self.repos = [f"repo-{i}" for i in range(repo_count)]
+        self.issues = {}
+        self.comments = {}
+        text = random.Random(1)
+        states = random.Random(3)
+        now = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+        for repo in self.repos:
+            self.issues[repo] = []
+            for number in range(1, issues_per_repo + prs_per_repo + 1):
+                kind, path = ("PR", "pull") if number > issues_per_repo else ("issue", "issues")
+                item = {
+                    "number": number,
+                    "title": f"{kind.capitalize()} {number} in {repo}",
+                    "body": f"Synthetic body for {kind} {number} in {repo}.{synthetic_text(text, body_words)}",
+                    "html_url": f"https://github.com/bench/{repo}/{path}/{number}",
+                    "state": "closed" if states.random() < closed_fraction else "open",
+                    "comments": comments_per_issue,
+                    "comments_url": f"{self.base_url}/repos/bench/{repo}/issues/{number}/comments",
+                    "updated_at": now,
+                }
+                if kind == "PR":
+                    item["pull_request"] = {"html_url": item["html_url"]}
+                self.issues[repo].append(item)
+            for number in range(1, issues_per_repo + prs_per_repo + 1):
+                self.comments[(repo, number)] = [
+                    {"body": f"Comment {i} on {repo}#{number}.{synthetic_text(text, comment_words)}"}
+                    for i in range(comments_per_issue)
+                ]
+
+    def issues_since(self, repo: str, since: str = None) -> list:
+        issues = self.issues.get(repo, [])
+        if since is None:
+            return issues
+        since_time = datetime.fromisoformat(since.replace("Z", "+00:00"))
+        return [
+            issue for issue in issues
+            if datetime.fromisoformat(issue["updated_at"].replace("Z", "+00:00")) >= since_time
+        ]
+
+    def touch(self, repo: str, numbers: list) -> None:
+        """
+        Marks issues as updated now, as a new comment or edit would.
+        """
+        now = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+        for issue in self.issues[repo]:
+            if issue["number"] in numbers:
+                issue["updated_at"] = now
+
+    def rate_limit_headers(self) -> dict:
+        if self.rate_limit is None:
+            return {}
+        with self.lock:
+            now = time.time()
+            if now >= self.window_start + self.rate_limit_window:
+                self.window_start = now
+                self.window_start_count = self.request_count
+            used = self.request_count - self.window_start_count
+        return {
+            "X-RateLimit-Limit": str(self.rate_limit),
+            "X-RateLimit-Remaining": str(max(0, self.rate_limit - used)),
+            "X-RateLimit-Reset": str(int(self.window_start + self.rate_limit_window)),
+        }
+
+    def answer_graphql(self, query: str, variables: dict) -> dict:
+        """
+        Answers the repository/issues/pullRequests queries built by main.build_graphql_query.
+        The issues connection filters on since, pullRequests does not, as on GitHub.
+        """
+        page_size = int(re.search(r"first: (\d+)", query).group(1))
+        data = {}
+        for alias in re.findall(r"(\w+): repository\(", query):
+            repo = variables[f"{alias}_name"]
+            if repo not in self.issues:
+                data[alias] = None
+                continue
+            data[alias] = {}
+            for field, cursor, pull_request in (("issues", "issues", False), ("pullRequests", "prs", True)):
+                if f"{alias}_{cursor}" not in variables:
+                    continue
+                items = self.issues_since(repo, variables.get("since") if not pull_request else None)
+                items = [item for item in items if ("pull_request" in item) == pull_request]
+                states = graphql_states(query, field)
+                if states is not None:
+                    items = [item for item in items if item["state"].upper() in states]
+                offset = int(variables[f"{alias}_{cursor}"] or 0)
+                page = items[offset:offset + page_size]
+                data[alias][field] = {
+                    "nodes": [
+                        {
+                            "number": item["number"],
+                            "title": item["title"],
+                            "body": item["body"],
+                            "url": item["html_url"],
+                            "updatedAt": item["updated_at"],
+                            "comments": {
+                                "totalCount": item["comments"],
+                                "nodes": self.comments[(repo, item["number"])][:variables["comments"]],
+                            },
+                        }
+                        for item in page
+                    ],
+                    "pageInfo": {"hasNextPage": offset + page_size < len(items), "endCursor": str(offset + page_size)},
+                }
+        return data
+
+
+def graphql_states(query: str, field: str) -> set | None:
+    """
+    Returns the states a connection of the query is filtered on, or None for no filter.
+    """
+    arguments = re.search(rf"{field}\(([^)]*)\)", query)
+    states = re.search(r"states: \[?([\w, ]+)\]?", arguments.group(1)) if arguments else None
+    return {state.strip() for state in states.group(1).split(",")} if states else None
+
+
+class FakeSlackHandler(FakeHandler):
+    def do_POST(self):
+        fake = self.fake
+        time.sleep(fake.latency)
+        body = json.loads(self.read_body())
+        if urlparse(self.path).path != "/chat.postMessage":
+            return self.send_json({"ok": False, "error": "unknown_method"}, status=404)
+
+        with fake.lock:
+            now = time.time()
+            fake.recent = [sent for sent in fake.recent if sent > now - 1]
+            if fake.rate_limit is not None and len(fake.recent) >= fake.rate_limit:
+                fake.throttled_count += 1
+                throttled = True
+            else:
+                throttled = False
+                fake.recent.append(now)
+                ts = f"{1700000000 + len(fake.messages)}.000100"
+                fake.messages.append({**body, "ts": ts})
+
+        if throttled:
+            return self.send_json({"ok": False, "error": "ratelimited"}, status=429, headers={"Retry-After": "1"})
+        self.send_json({"ok": True, "channel": body.get("channel"), "ts": ts})
+
+
+class FakeSlack(FakeServer):
+    """
+    Fake Slack Web API serving chat.postMessage.
+
+    Args:
+        latency: Seconds to sleep before answering each request
+        rate_limit: Messages accepted per second, further requests are answered with
+            429 and Retry-After (None for no limit)
+    """
+
+    def __init__(self, latency: float = 0.0, rate_limit: int = None):
+        super().__init__(FakeSlackHandler)
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self.throttled_count = 0
+        self.lock = threading.Lock()
+        self.recent = []
+        self.messages = []
+
+    def replies(self, ts: str) -> list:
+        return [message for message in self.messages if message.get("thread_ts") == ts]
+
+
+def parse_multipart(content_type: str, body: bytes) -> dict:
+    """
+    Returns the parts of a multipart/form-data body by field name.
+    """
+    message = BytesParser(policy=default).parsebytes(f"Content-Type: {content_type}\r\n\r\n".encode() + body)
+    return {part.get_param("name", header="content-disposition"): part for part in message.iter_parts()}
+
+
+class FakeBatchHandler(FakeHandler):
+    def route(self) -> list:
+        parts = urlparse(self.path).path.strip("/").split("/")
+        return parts[1:] if parts[0] == "v1" else parts
+
+    def do_GET(self):
+        fake = self.fake
+        time.sleep(fake.latency)
+        with fake.lock:
+            fake.request_count += 1
+        parts = self.route()
+        if len(parts) == 2 and parts[0] == "batches" and parts[1] in fake.batches:
+            return self.send_json(fake.batch_object(parts[1]))
+        if len(parts) == 3 and parts[0] == "files" and parts[2] == "content":
+            content = fake.file_content(parts[1])
+            if content is not None:
+                return self.send_bytes(content)
+        self.send_json({"error": {"message": "Not Found"}}, status=404)
+
+    def do_POST(self):
+        fake = self.fake
+        time.sleep(fake.latency)
+        with fake.lock:
+            fake.request_count += 1
+        parts = self.route()
+        body = self.read_body()
+        if parts == ["files"]:
+            fields = parse_multipart(self.headers["Content-Type"], body)
+            content = fields["file"].get_payload(decode=True)
+            filename = fields["file"].get_filename()
+            if filename.endswith(".gz"):
+                content = gzip.decompress(content)
+            return self.send_json(fake.create_file(content, filename, fields["purpose"].get_content().strip()))
+        if parts == ["batches"]:
+            return self.send_json(fake.create_batch(json.loads(body)))
+        if parts == ["uploads"]:
+            return self.send_json(fake.create_upload(json.loads(body)))
+        if len(parts) == 3 and parts[0] == "uploads" and parts[1] in fake.uploads:
+            if parts[2] == "parts":
+                with fake.lock:
+                    failed = fake.rng.random() < fake.fail_parts
+                    fake.failed_parts += failed
+                if failed:
+                    return self.send_json({"error": {"message": "Internal Server Error"}}, status=500)
+                data = parse_multipart(self.headers["Content-Type"], body)["data"].get_payload(decode=True)
+                return self.send_json(fake.add_upload_part(parts[1], data))
+            if parts[2] == "complete":
+                return self.send_json(fake.complete_upload(parts[1], json.loads(body)["part_ids"]))
+            if parts[2] == "cancel":
+                fake.uploads[parts[1]]["status"] = "cancelled"
+                return self.send_json(fake.upload_object(parts[1]))
+        self.send_json({"error": {"message": "Not Found"}}, status=404)
+
+
+class FakeBatchAPI(FakeServer):
+    """
+    Fake OpenAI-compatible Files, Uploads and Batches API, as served by kluster.ai.
+
+    Uploaded batch input files are answered with one synthetic chat completion per task.
+    A batch is validating for queue_seconds, then completes requests_per_second tasks per
+    second. Files uploaded with a .gz name are decompressed. Use f"{fake.base_url}/v1" as
+    the client base URL.
+
+    Args:
+        latency: Seconds to sleep before answering each request
+        queue_seconds: Seconds a new batch waits before its first task completes
+        requests_per_second: Tasks completed per second once a batch is in progress
+        partial_output: Whether running batches expose an output file with the results
+            completed so far
+        summary_words: Words of synthetic text in each completion
+        fail_parts: Fraction of upload parts answered with 500 Internal Server Error
+        fail_requests: Fraction of tasks that fail, they are reported in the batch's error
+            file instead of its output file
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        queue_seconds: float = 0.0,
+        requests_per_second: float = 1000.0,
+        partial_output: bool = False,
+        summary_words: int = 60,
+        fail_parts: float = 0.0,
+        fail_requests: float = 0.0
+    ):
+        super().__init__(FakeBatchHandler)
+        self.latency = latency
+        self.queue_seconds = queue_seconds
+        self.requests_per_second = requests_per_second
+        self.partial_output = partial_output
+        self.summary_words = summary_words
+        self.fail_parts = fail_parts
+        self.failed_parts = 0
+        self.fail_requests = fail_requests
+        self.rng = random.Random(2)
+        self.lock = threading.Lock()
+        self.request_count = 0
+        self.uploaded_bytes = 0
+        self.downloaded_bytes = 0
+        self.files = {}
+        self.uploads = {}
+        self.batches = {}
+
+    def create_file(self, content: bytes, filename: str, purpose: str) -> dict:
+        with self.lock:
+            file_id = f"file-{len(self.files)}"
+            self.files[file_id] = content
+            self.uploaded_bytes += len(content)
+        return {
+            "id": file_id,
+            "object": "file",
+            "bytes": len(content),
+            "created_at": int(time.time()),
+            "filename": filename,
+            "purpose": purpose,
+            "status": "processed",
+        }
+
+    def create_upload(self, request: dict) -> dict:
+        with self.lock:
+            upload_id = f"upload-{len(self.uploads)}"
+            self.uploads[upload_id] = {"request": request, "parts": {}, "status": "pending", "file": None}
+        return self.upload_object(upload_id)
+
+    def add_upload_part(self, upload_id: str, data: bytes) -> dict:
+        upload = self.uploads[upload_id]
+        with self.lock:
+            part_id = f"part-{upload_id}-{len(upload['parts'])}"
+            upload["parts"][part_id] = data
+        return {"id": part_id, "object": "upload.part", "created_at": int(time.time()), "upload_id": upload_id}
+
+    def complete_upload(self, upload_id: str, part_ids: list) -> dict:
+        upload = self.uploads[upload_id]
+        content = b"".join(upload["parts"][part_id] for part_id in part_ids)
+        upload["file"] = self.create_file(content, upload["request"]["filename"], upload["request"]["purpose"])
+        upload["status"] = "completed"
+        return self.upload_object(upload_id)
+
+    def upload_object(self, upload_id: str) -> dict:
+        upload = self.uploads[upload_id]
+        return {
+            "id": upload_id,
+            "object": "upload",
+            "bytes": upload["request"]["bytes"],
+            "created_at": int(time.time()),
+            "expires_at": int(time.time()) + 3600,
+            "filename": upload["request"]["filename"],
+            "purpose": upload["request"]["purpose"],
+            "status": upload["status"],
+            "file": upload["file"],
+        }
+
+    def create_batch(self, request: dict) -> dict:
+        tasks = [json.loads(line) for line in self.files[request["input_file_id"]].splitlines() if line.strip()]
+        with self.lock:
+            batch_id = f"batch-{len(self.batches)}"
+            self.batches[batch_id] = {
+                "request": request,
+                "tasks": tasks,
+                "failed": [self.rng.random() < self.fail_requests for _ in tasks],
+                "created": time.time(),
+                "results": None,
+                "errors": None,
+            }
+        return self.batch_object(batch_id)
+
+    def completed(self, batch_id: str) -> int:
+        batch = self.batches[batch_id]
+        elapsed = time.time() - batch["created"] - self.queue_seconds
+        if elapsed < 0:
+            return -1
+        return min(len(batch["tasks"]), int(elapsed * self.requests_per_second))
+
+    def batch_object(self, batch_id: str) -> dict:
+        batch = self.batches[batch_id]
+        total = len(batch["tasks"])
+        completed = self.completed(batch_id)
+        if completed < 0:
+            status = "validating"
+        elif completed < total:
+            status = "in_progress"
+        else:
+            status = "completed"
+        failed = sum(batch["failed"][:max(0, completed)])
+        has_output = (status == "completed" or self.partial_output) and completed > failed
+        return {
+            "id": batch_id,
+            "object": "batch",
+            "endpoint": batch["request"]["endpoint"],
+            "input_file_id": batch["request"]["input_file_id"],
+            "completion_window": batch["request"]["completion_window"],
+            "status": status,
+            "output_file_id": f"file-output-{batch_id}" if has_output else None,
+            "error_file_id": f"file-error-{batch_id}" if status == "completed" and failed else None,
+            "errors": None,
+            "created_at": int(batch["created"]),
+            "request_counts": {"total": total, "completed": max(0, completed) - failed, "failed": failed},
+            "metadata": None,
+        }
+
+    def result_line(self, task: dict) -> bytes:
+        content = f"Summary of {task['custom_id']}.{synthetic_text(self.rng, self.summary_words)}"
+        return json.dumps({
+            "id": f"batch_req_{task['custom_id']}",
+            "custom_id": task["custom_id"],
+            "response": {
+                "status_code": 200,
+                "request_id": task["custom_id"],
+                "body": {
+                    "object": "chat.completion",
+                    "model": task["body"]["model"],
+                    "choices": [
+                        {"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}
+                    ],
+                },
+            },
+            "error": None,
+        }).encode() + b"\n"
+
+    def error_line(self, task: dict) -> bytes:
+        return json.dumps({
+            "id": f"batch_req_{task['custom_id']}",
+            "custom_id": task["custom_id"],
+            "response": {
+                "status_code": 500,
+                "request_id": task["custom_id"],
+                "body": {"error": {"message": "The server had an error processing your request.", "type": "server_error"}},
+            },
+            "error": None,
+        }).encode() + b"\n"
+
+    def file_content(self, file_id: str) -> bytes | None:
+        if file_id in self.files:
+            return self.files[file_id]
+        kind, _, batch_id = file_id.removeprefix("file-").partition("-")
+        if kind not in ("output", "error") or batch_id not in self.batches:
+            return None
+        batch = self.batches[batch_id]
+        with self.lock:
+            if batch["results"] is None:
+                batch["results"] = [
+                    self.error_line(task) if failed else self.result_line(task)
+                    for task, failed in zip(batch["tasks"], batch["failed"])
+                ]
+        done = max(0, self.completed(batch_id))
+        content = b"".join(
+            line for line, failed in zip(batch["results"][:done], batch["failed"][:done])
+            if failed == (kind == "error")
+        )
+        with self.lock:
+            self.downloaded_bytes += len(content)
+        return content
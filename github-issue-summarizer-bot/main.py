@@ -1,17 +1,47 @@
 import argparse
+import gzip
+import hashlib
+import inspect
+import io
+import itertools
 import json
 import os
+import random
 import shutil
+import sqlite3
+import threading
 import time
-from datetime import datetime, timedelta
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
-from typing import Tuple
+from typing import TYPE_CHECKING, Tuple
+from urllib.parse import parse_qs, urlparse
+
+try:
+    import fcntl
+except ImportError:  # Windows, runs are not locked
+    fcntl = None
 
 import requests
-import tiktoken
 import yaml
 from dotenv import load_dotenv
-from openai import OpenAI
+from requests.adapters import HTTPAdapter
+
+# openai, tiktoken, regex and asyncio are imported where they are first needed, so --help,
+# configuration errors and runs without new issues start quickly
+if TYPE_CHECKING:
+    from openai import OpenAI
+
+GITHUB_API_URL = "https://api.github.com"
+SLACK_API_URL = "https://slack.com/api"
+# Fetch windows start this long before the previous fetch did, to cover clock skew and
+# GitHub's one second timestamps. Issues fetched twice are skipped by their updated_at.
+WATERMARK_OVERLAP = timedelta(minutes=1)
+# Name format of the per-run directories in the batch directory
+RUN_DIR_FORMAT = "%Y%m%d_%H%M%S_%f"
 
 def load_config(config_path: str = 'config.yaml', env_path: str = None):
     """
@@ -50,16 +80,57 @@ def load_config(config_path: str = 'config.yaml', env_path: str = None):
     # Define default values
     default_processing = {
         'limits': {
-            'max_input_tokens_per_request': 100000
+            'max_input_tokens_per_request': 100000,
+            'truncation_mode': 'head'
         },
         'batch': {
             'generated_files_directory': 'batch_files',
             'cleanup': True,
-            'keep_days': 7
+            'keep_days': 7,
+            'shard_max_requests': 10000,
+            'shard_max_mb': 100,
+            'submit_workers': 4,
+            'poll_min_seconds': 5,
+            'poll_max_seconds': 120,
+            'stream_results': False,
+            'dedupe_requests': True,
+            'upload_part_mb': 0,
+            'upload_gzip': False,
+            'compress_artifacts': True,
+            'max_resume_attempts': 3
         },
         'history': {
             'default_lookback_hours': 24,
-            'use_last_run_file': True
+            'use_last_run_file': True,
+            'use_watermarks': True
+        },
+        'concurrency': {
+            'github_workers': 8
+        },
+        'cache': {
+            'enabled': True,
+            'directory': 'summary_cache',
+            'max_age_days': 30,
+            'max_size_mb': 100
+        },
+        'http_cache': {
+            'enabled': True,
+            'directory': 'http_cache',
+            'max_age_days': 7
+        },
+        'tokenizer': {
+            'cache_dir': None
+        },
+        'metrics': {
+            'enabled': True,
+            'prometheus_textfile': None
+        },
+        'rate_limit': {
+            'max_retries': 5,
+            'backoff_seconds': 1,
+            'max_backoff_seconds': 60,
+            'pace_below_remaining': 100,
+            'timeout_seconds': 30
         }
     }
 
@@ -70,7 +141,7 @@ def load_config(config_path: str = 'config.yaml', env_path: str = None):
     for section, values in default_processing.items():
         config['processing'].setdefault(section, {})
         for key, default_value in values.items():
-            if not config['processing'][section].get(key):
+            if config['processing'][section].get(key) in (None, ''):
                 config['processing'][section][key] = default_value
     
     # Add initialization for runtime section
@@ -84,6 +155,18 @@ def load_config(config_path: str = 'config.yaml', env_path: str = None):
         'klusterai': {
             'model': 'klusterai/Meta-Llama-3.1-405B-Instruct-Turbo',
             'base_url': 'https://api.kluster.ai/v1'
+        },
+        'slack': {
+            'base_url': SLACK_API_URL,
+            'threads': False,
+            'post_workers': 4
+        },
+        'github': {
+            'base_url': GITHUB_API_URL,
+            'fetch_backend': 'rest',
+            'graphql_repos_per_query': 10,
+            'graphql_page_size': 50,
+            'graphql_comments_per_issue': 30
         }
     }
 
@@ -122,11 +205,45 @@ def load_config(config_path: str = 'config.yaml', env_path: str = None):
     
     return config
 
-def setup_tokenizer():
+def setup_tokenizer(cache_dir: str = None):
+    """
+    Loads the cl100k_base tokenizer.
+    
+    tiktoken downloads its BPE file on first use and keeps it in TIKTOKEN_CACHE_DIR,
+    a temporary directory by default. With cache_dir pointing at a pre-warmed cache,
+    loading needs no network access.
+    """
+    import tiktoken
+    if cache_dir:
+        os.environ["TIKTOKEN_CACHE_DIR"] = str(cache_dir)
     # estimate for simplicity..
     return tiktoken.get_encoding("cl100k_base")
 
-tokenizer = setup_tokenizer()
+_tokenizer = None
+_pretokenizer = None
+_tokenizer_lock = threading.Lock()
+
+def get_tokenizer():
+    """
+    Returns the shared tokenizer, loading it the first time tokens are counted.
+    """
+    global _tokenizer, _pretokenizer
+    if _tokenizer is None:
+        with _tokenizer_lock:
+            if _tokenizer is None:
+                import regex
+                tokenizer = setup_tokenizer()
+                # Splits text into the same words the tokenizer encodes independently. The
+                # pattern is a private attribute (tiktoken is pinned for it), without it
+                # token counts fall back to encoding the whole text
+                pattern = getattr(tokenizer, "_pat_str", None)
+                _pretokenizer = regex.compile(pattern) if pattern else None
+                _tokenizer = tokenizer
+    return _tokenizer
+
+def get_pretokenizer():
+    get_tokenizer()
+    return _pretokenizer
 
 def calculate_tokens(text):
     """
@@ -139,7 +256,72 @@ def calculate_tokens(text):
     Returns:
         int: Number of tokens in the text
     """
-    return len(tokenizer.encode(text, disallowed_special=()))
+    return len(get_tokenizer().encode(text, disallowed_special=()))
+
+TRUNCATION_MARKER = "\n\n[... truncated ...]\n\n"
+
+def truncate_to_tokens(text: str, max_tokens: int, mode: str = "head") -> str:
+    """
+    Truncates text to at most the given number of tokens.
+    
+    The text is encoded once, sliced on token ids and decoded back. In "head" mode
+    the opening of the text is kept, in "head_tail" mode the opening and the most
+    recent text are kept around a truncation marker.
+    
+    Args:
+        text: Text to truncate
+        max_tokens: Maximum number of tokens in the result
+        mode: "head" or "head_tail"
+        
+    Returns:
+        str: The text unchanged if it fits, otherwise its truncated version
+    """
+    if mode not in ("head", "head_tail"):
+        raise ValueError(f"Unknown truncation mode '{mode}'")
+    
+    tokenizer = get_tokenizer()
+    tokens = tokenizer.encode(text, disallowed_special=())
+    budget = max_tokens
+    
+    while budget > 0 and len(tokens) > max_tokens:
+        if mode == "head_tail" and budget > calculate_tokens(TRUNCATION_MARKER):
+            kept = budget - calculate_tokens(TRUNCATION_MARKER)
+            tail_size = kept // 2
+            head = tokenizer.decode(tokens[:kept - tail_size])
+            tail = tokenizer.decode(tokens[len(tokens) - tail_size:]) if tail_size else ""
+            truncated = head + TRUNCATION_MARKER + tail
+        else:
+            truncated = tokenizer.decode(tokens[:budget])
+        
+        # Slicing can split a character or a merge, so re-check after decoding
+        overshoot = calculate_tokens(truncated) - max_tokens
+        if overshoot <= 0:
+            return truncated
+        budget -= overshoot
+    
+    return text if len(tokens) <= max_tokens else ""
+
+def find_token_tail(text: str, words: int = 2) -> int:
+    """
+    Finds where the last few pre-tokenized words of a text start.
+    
+    BPE merges never cross a word boundary, so appending to the text can only change
+    the tokens of the words after this offset. If the tokenizer does not expose its
+    pre-tokenization pattern, the whole text is returned as the tail, so callers
+    count the tokens of the full text instead.
+    
+    Args:
+        text: Text to scan
+        words: Number of trailing words to include in the tail
+        
+    Returns:
+        int: Offset of the tail within the text
+    """
+    pretokenizer = get_pretokenizer()
+    if pretokenizer is None:
+        return 0
+    starts = deque((match.start() for match in pretokenizer.finditer(text)), maxlen=words)
+    return starts[0] if starts else 0
 
 def get_last_run_time(last_run_file: Path, config: dict) -> datetime:
     """
@@ -168,168 +350,995 @@ def get_last_run_time(last_run_file: Path, config: dict) -> datetime:
     print(f"Using default lookback time: {lookback_time} ({lookback_hours} hours)")
     return lookback_time
 
-def update_last_run_time(last_run_file: Path):
+def update_last_run_time(last_run_file: Path, timestamp: float = None):
     """
     Updates the last run timestamp.
     
     Args:
         last_run_file: Path to store the timestamp
+        timestamp: Time to store, defaults to now
     """
     with open(last_run_file, 'w') as f:
-        f.write(f"{time.time():.3f}")
+        f.write(f"{time.time() if timestamp is None else timestamp:.3f}")
+
+def parse_github_time(timestamp: str) -> datetime:
+    return datetime.fromisoformat(timestamp.replace("Z", "+00:00")).astimezone(timezone.utc)
+
+class WatermarkStore:
+    """
+    Per-repository fetch watermarks and per-issue update times, kept in SQLite.
+    
+    A repository's watermark is the time its last successful fetch started, so every
+    repository is fetched exactly from where it left off and one whose fetch failed
+    keeps its old window until it succeeds. The updated_at of every summarized issue is
+    stored as well, and issues fetched again without a newer update (the boundary of
+    overlapping windows, retried repositories) are skipped.
+    
+    Updates are staged while fetching and only written by commit(), once the run that
+    summarized the issues has completed.
+    """
+    
+    def __init__(self, path: Path):
+        self.connection = sqlite3.connect(path)
+        self.pending = {"repos": {}, "issues": []}
+        with self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS repos (owner TEXT, repo TEXT, since TEXT, PRIMARY KEY (owner, repo))"
+            )
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS issues "
+                "(owner TEXT, repo TEXT, number INTEGER, updated_at TEXT, PRIMARY KEY (owner, repo, number))"
+            )
+    
+    def repo_since(self, owner: str, repo: str) -> datetime | None:
+        row = self.connection.execute(
+            "SELECT since FROM repos WHERE owner = ? AND repo = ?", (owner, repo)
+        ).fetchone()
+        return datetime.fromisoformat(row[0]) if row else None
+    
+    def filter_changed(self, owner: str, repo: str, issues: list) -> list:
+        """
+        Returns the issues whose updated_at differs from the stored one, in input order.
+        """
+        known = dict(self.connection.execute(
+            "SELECT number, updated_at FROM issues WHERE owner = ? AND repo = ?", (owner, repo)
+        ))
+        return [
+            issue for issue in issues
+            if known.get(issue["number"]) != parse_github_time(issue["updated_at"]).isoformat()
+        ]
+    
+    def stage(self, owner: str, repo: str, issues: list, fetched_since: datetime = None) -> None:
+        """
+        Stages the update times of a repository's issues and, if its fetch succeeded,
+        the start time of that fetch as its new watermark.
+        """
+        if fetched_since is not None:
+            self.pending["repos"][f"{owner}/{repo}"] = fetched_since.isoformat()
+        self.pending["issues"].extend(
+            [owner, repo, issue["number"], parse_github_time(issue["updated_at"]).isoformat()]
+            for issue in issues
+        )
+    
+    def commit(self, pending: dict = None, unsummarized: set = frozenset()) -> None:
+        """
+        Writes staged updates, or the ones given, e.g. as saved in a run journal.
+        
+        Issues in unsummarized, as (repo, number) pairs, got no summary. Their update
+        times and the watermarks of their repositories are left as they were, so the
+        next run fetches and summarizes them again.
+        """
+        pending = pending or self.pending
+        missed_repos = {repo for repo, _ in unsummarized}
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO repos VALUES (?, ?, ?)",
+                [
+                    (*name.split("/", 1), since) for name, since in pending["repos"].items()
+                    if name.split("/", 1)[1] not in missed_repos
+                ]
+            )
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO issues VALUES (?, ?, ?, ?)",
+                [issue for issue in pending["issues"] if (issue[1], issue[2]) not in unsummarized]
+            )
+        self.pending = {"repos": {}, "issues": []}
+    
+    def close(self) -> None:
+        self.connection.close()
+
+class RateLimitAdapter(HTTPAdapter):
+    """
+    Transport adapter that schedules GitHub (and Slack) requests around the API rate limits.
+    
+    The X-RateLimit-Remaining and X-RateLimit-Reset headers of every response are
+    tracked across threads. Once the remaining budget drops below pace_below_remaining
+    requests are spread evenly until the reset time, and when it is exhausted all
+    requests wait for the reset. Rate-limited (403/429) and 5xx responses as well as
+    connection errors and timeouts are retried with jittered exponential backoff,
+    honoring Retry-After when GitHub sends it. Requests sent without a timeout time out
+    after timeout_seconds.
+    
+    With retry_posts off, a POST is only retried after a 429 with Retry-After, which is
+    answered before the request is processed. Other failures may come after the request
+    took effect, and resending a non-idempotent call such as Slack's chat.postMessage
+    would repeat it.
+    """
+    
+    RETRY_STATUSES = (429, 500, 502, 503, 504)
+    
+    def __init__(
+        self,
+        max_retries: int = 5,
+        backoff_seconds: float = 1,
+        max_backoff_seconds: float = 60,
+        pace_below_remaining: int = 100,
+        timeout_seconds: float = 30,
+        retry_posts: bool = True,
+        **kwargs
+    ):
+        super().__init__(**kwargs)
+        self.retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self.pace_below_remaining = pace_below_remaining
+        self.timeout_seconds = timeout_seconds
+        self.retry_posts = retry_posts
+        self.remaining = None
+        self.reset_time = 0.0
+        self.blocked_until = 0.0
+        self.next_slot = 0.0
+        self.retry_count = 0
+        self.request_count = 0
+        self.bytes_received = 0
+        self.limit_lock = threading.Lock()
+    
+    def wait_for_slot(self) -> None:
+        with self.limit_lock:
+            now = time.time()
+            wait_until = self.blocked_until
+            if self.remaining is not None and self.reset_time > now:
+                if self.remaining <= 0:
+                    wait_until = max(wait_until, self.reset_time)
+                elif self.remaining < self.pace_below_remaining:
+                    slot = max(self.next_slot, now)
+                    self.next_slot = slot + (self.reset_time - now) / self.remaining
+                    wait_until = max(wait_until, slot)
+        
+        if wait_until > now:
+            time.sleep(wait_until - now)
+    
+    def update_limits(self, response: requests.Response) -> None:
+        remaining = response.headers.get("X-RateLimit-Remaining")
+        reset = response.headers.get("X-RateLimit-Reset")
+        if remaining is None or reset is None:
+            return
+        with self.limit_lock:
+            self.remaining = int(remaining)
+            self.reset_time = float(reset)
+    
+    def retry_delay(self, response: requests.Response | None, attempt: int) -> float | None:
+        """
+        Returns how long to wait before retrying a response, or None if it should not be retried.
+        """
+        if response is not None:
+            rate_limited = response.status_code == 429 or (
+                response.status_code == 403 and (
+                    response.headers.get("Retry-After")
+                    or response.headers.get("X-RateLimit-Remaining") == "0"
+                    or "rate limit" in response.text.lower()
+                )
+            )
+            if not rate_limited and response.status_code not in self.RETRY_STATUSES:
+                return None
+            
+            retry_after = response.headers.get("Retry-After")
+            if retry_after and retry_after.isdigit():
+                return float(retry_after)
+            if response.headers.get("X-RateLimit-Remaining") == "0":
+                reset = float(response.headers.get("X-RateLimit-Reset", 0))
+                return max(0.0, reset - time.time()) + 1
+        
+        return random.uniform(0, min(self.max_backoff_seconds, self.backoff_seconds * 2 ** attempt))
+    
+    def may_resend(self, request: requests.PreparedRequest, response: requests.Response | None) -> bool:
+        if self.retry_posts or request.method != "POST":
+            return True
+        return response is not None and response.status_code == 429 and bool(response.headers.get("Retry-After"))
+    
+    def send(self, request: requests.PreparedRequest, **kwargs) -> requests.Response:
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = self.timeout_seconds
+        for attempt in range(self.retries + 1):
+            self.wait_for_slot()
+            try:
+                response = super().send(request, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                if attempt == self.retries or not self.may_resend(request, None):
+                    raise
+                response = None
+            else:
+                self.update_limits(response)
+                received = 0 if kwargs.get("stream") else len(response.content)
+                with self.limit_lock:
+                    self.request_count += 1
+                    self.bytes_received += received
+            
+            delay = self.retry_delay(response, attempt)
+            if delay is None or attempt == self.retries or not self.may_resend(request, response):
+                return response
+            
+            status = response.status_code if response is not None else "connection error"
+            print(f"Request to {request.url} failed ({status}), retrying in {delay:.1f}s")
+            with self.limit_lock:
+                self.retry_count += 1
+                if response is not None and response.status_code in (403, 429):
+                    # Rate limits apply to the whole token, so hold back every thread
+                    self.blocked_until = max(self.blocked_until, time.time() + delay)
+            if response is not None:
+                response.close()
+            time.sleep(delay)
+    
+    def counters(self) -> dict:
+        with self.limit_lock:
+            return {"requests": self.request_count, "bytes_received": self.bytes_received, "retries": self.retry_count}
+
+class ETagCacheAdapter(RateLimitAdapter):
+    """
+    Transport adapter that revalidates GET requests with ETags stored on disk.
+    
+    Each cached response is sent with If-None-Match, a 304 Not Modified answer
+    (which does not count against GitHub's rate limit) is replaced by the stored
+    body so callers always see a regular 200 response. Requests with a since
+    parameter, such as the issue lists, get a new URL every run and would never be
+    revalidated, so they bypass the cache instead of filling it with dead entries.
+    Keying them without since is not an option: the stored body of an earlier
+    since holds issues outside the new window.
+    """
+    
+    def __init__(self, cache_dir: Path, **kwargs):
+        super().__init__(**kwargs)
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+    
+    def cache_path(self, request: requests.PreparedRequest) -> Path:
+        key = f"{request.url}\n{request.headers.get('Authorization', '')}"
+        return self.cache_dir / f"{hashlib.sha256(key.encode()).hexdigest()}.json"
+    
+    def send(self, request: requests.PreparedRequest, **kwargs) -> requests.Response:
+        if request.method != "GET" or "since" in parse_qs(urlparse(request.url).query):
+            return super().send(request, **kwargs)
+        
+        path = self.cache_path(request)
+        try:
+            with open(path, "r") as f:
+                cached = json.load(f)
+            request.headers["If-None-Match"] = cached["etag"]
+        except (FileNotFoundError, ValueError, KeyError):
+            cached = None
+        
+        response = super().send(request, **kwargs)
+        
+        if response.status_code == 304 and cached:
+            response.status_code = 200
+            response.reason = "OK"
+            response._content = cached["body"].encode("utf-8")
+            response.encoding = "utf-8"
+            if cached.get("link"):
+                response.headers["Link"] = cached["link"]
+            path.touch()
+            with self.lock:
+                self.hits += 1
+        elif response.status_code == 200:
+            etag = response.headers.get("ETag")
+            if etag:
+                entry = {"etag": etag, "link": response.headers.get("Link"), "body": response.text}
+                temp_path = path.with_suffix(f".{threading.get_ident()}.tmp")
+                with open(temp_path, "w") as f:
+                    json.dump(entry, f)
+                os.replace(temp_path, path)
+            with self.lock:
+                self.misses += 1
+        
+        return response
+
+def create_github_session(
+    github_token: str,
+    pool_size: int = 8,
+    cache_dir: Path = None,
+    rate_limit: dict = None
+) -> requests.Session:
+    """
+    Creates a GitHub API session that reuses pooled keep-alive connections.
+    
+    Args:
+        github_token: GitHub authentication token
+        pool_size: Maximum number of connections kept open per host
+        cache_dir: Optional directory for the ETag response cache
+        rate_limit: Optional RateLimitAdapter settings (processing.rate_limit)
+        
+    Returns:
+        requests.Session: Session with authentication headers and connection pool
+    """
+    session = requests.Session()
+    session.headers.update({"Authorization": f"token {github_token}"})
+    adapter_settings = {**(rate_limit or {}), "pool_connections": pool_size, "pool_maxsize": pool_size}
+    if cache_dir:
+        adapter = ETagCacheAdapter(cache_dir, **adapter_settings)
+    else:
+        adapter = RateLimitAdapter(**adapter_settings)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+def log_http_cache_stats(session: requests.Session, base_url: str = GITHUB_API_URL) -> None:
+    """
+    Prints the ETag cache hit/miss counters and rate limit state of a GitHub session.
+    """
+    adapter = session.get_adapter(base_url)
+    if isinstance(adapter, ETagCacheAdapter):
+        print(f"GitHub HTTP cache: {adapter.hits} hits (304 Not Modified), {adapter.misses} misses")
+    if isinstance(adapter, RateLimitAdapter):
+        print(f"GitHub rate limit: {adapter.remaining} requests remaining, {adapter.retry_count} retries")
+
+def evict_http_cache(cache_dir: Path, max_age_days: int = 7) -> None:
+    """
+    Removes cached GitHub responses that were not used for max_age_days.
+    """
+    cache_dir = Path(cache_dir)
+    if not cache_dir.exists():
+        return
+    
+    cutoff = time.time() - max_age_days * 86400
+    for entry in cache_dir.glob("*.json"):
+        try:
+            if entry.stat().st_mtime < cutoff:
+                entry.unlink()
+        except OSError as e:
+            print(f"Error evicting cache entry {entry}: {e}")
+
+class RunMetrics:
+    """
+    Records the wall time and counters of each stage of a run.
+    
+    A stage's time excludes the stages nested inside it on the same thread, so the
+    stage times add up to the time of the run. When a stage is given a session, the
+    requests, received bytes and retries its RateLimitAdapter made during the stage
+    are added to it. Other counters, such as tokens or uploaded bytes, are added with
+    count().
+    """
+    
+    def __init__(self):
+        self.started = time.time()
+        self.status = "running"
+        self.stages = {}
+        self.lock = threading.Lock()
+        self.local = threading.local()
+    
+    def count(self, stage: str, **counters) -> None:
+        with self.lock:
+            entry = self.stages.setdefault(stage, {"seconds": 0.0})
+            for name, value in counters.items():
+                entry[name] = entry.get(name, 0) + value
+    
+    @contextmanager
+    def stage(self, name: str, session: requests.Session = None):
+        adapter = session.get_adapter("https://") if session else None
+        before = adapter.counters() if isinstance(adapter, RateLimitAdapter) else {}
+        stack = self.local.__dict__.setdefault("stack", [])
+        stack.append(name)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            stack.pop()
+            after = adapter.counters() if before else {}
+            self.count(name, seconds=elapsed, **{key: after[key] - before[key] for key in after})
+            if stack:
+                self.count(stack[-1], seconds=-elapsed)
+    
+    def summary(self) -> dict:
+        with self.lock:
+            stages = {
+                name: {key: round(value, 3) if isinstance(value, float) else value for key, value in counters.items()}
+                for name, counters in self.stages.items()
+            }
+        return {
+            "started": datetime.fromtimestamp(self.started, timezone.utc).isoformat(),
+            "seconds": round(time.time() - self.started, 3),
+            "status": self.status,
+            "stages": stages
+        }
+    
+    def describe(self) -> str:
+        summary = self.summary()
+        lines = [f"Run {summary['status']} in {summary['seconds']:.1f}s"]
+        for name, counters in summary["stages"].items():
+            details = ", ".join(f"{value} {key}" for key, value in counters.items() if key != "seconds")
+            lines.append(f"- {name}: {counters['seconds']:.1f}s" + (f" ({details})" if details else ""))
+        return "\n".join(lines)
+    
+    def write_json(self, path: Path) -> None:
+        """
+        Appends the run's summary as one JSON line, so the file keeps the history of runs.
+        """
+        with open(path, "a") as f:
+            f.write(json.dumps(self.summary()) + "\n")
+    
+    def write_prometheus(self, path: Path, prefix: str = "github_summarizer") -> None:
+        """
+        Writes the run's summary in the Prometheus text format, e.g. for the node_exporter
+        textfile collector. The file is replaced atomically.
+        """
+        summary = self.summary()
+        lines = [
+            f"# HELP {prefix}_last_run_timestamp_seconds Start time of the last run",
+            f"# TYPE {prefix}_last_run_timestamp_seconds gauge",
+            f"{prefix}_last_run_timestamp_seconds {self.started:.3f}",
+            f"# HELP {prefix}_last_run_seconds Wall time of the last run",
+            f"# TYPE {prefix}_last_run_seconds gauge",
+            f"{prefix}_last_run_seconds {summary['seconds']}",
+            f"# HELP {prefix}_last_run_success Whether the last run completed without an error",
+            f"# TYPE {prefix}_last_run_success gauge",
+            f"{prefix}_last_run_success {0 if summary['status'] == 'failed' else 1}",
+        ]
+        counter_names = sorted({key for counters in summary["stages"].values() for key in counters})
+        for key in counter_names:
+            metric = f"{prefix}_stage_{key}"
+            lines.append(f"# HELP {metric} {key.replace('_', ' ').capitalize()} of each stage of the last run")
+            lines.append(f"# TYPE {metric} gauge")
+            for name, counters in summary["stages"].items():
+                if key in counters:
+                    lines.append(f'{metric}{{stage="{name}"}} {counters[key]}')
+        
+        path = Path(path)
+        temp_path = path.with_suffix(f"{path.suffix}.{os.getpid()}.tmp")
+        with open(temp_path, "w") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(temp_path, path)
+
+def get_last_page(response: requests.Response) -> int | None:
+    """
+    Reads the last page number advertised in a GitHub Link header.
+    
+    Args:
+        response: Response for the first page of a paginated endpoint
+        
+    Returns:
+        int | None: Last page number, or None if the header does not provide it
+    """
+    last_url = response.links.get("last", {}).get("url")
+    if not last_url:
+        return None
+    page = parse_qs(urlparse(last_url).query).get("page")
+    return int(page[0]) if page else None
+
+def fetch_page(session: requests.Session, url: str, params: dict, page: int) -> tuple:
+    """
+    Fetches a single page of a paginated GitHub endpoint.
+    
+    Returns:
+        tuple: (response, None) on success or (None, error) on failure
+    """
+    try:
+        response = session.get(url, params={**params, "page": page})
+        response.raise_for_status()
+        return response, None
+    except requests.exceptions.RequestException as e:
+        return None, e
+
+def follow_pages(session: requests.Session, url: str, params: dict, page: int) -> tuple:
+    """
+    Fetches pages one at a time starting at `page` until an empty page is returned.
+    
+    Returns:
+        tuple: (items, error) with every item fetched before the first failure
+    """
+    items = []
+    while True:
+        response, error = fetch_page(session, url, params, page)
+        if error:
+            return items, error
+        page_items = response.json()
+        if not page_items:
+            return items, None
+        items.extend(page_items)
+        page += 1
+
+def fetch_paginated(session: requests.Session, urls: list, params: dict | list, max_workers: int = 8) -> list:
+    """
+    Fetches every page of one or more paginated GitHub endpoints concurrently.
+    
+    The first page of each URL is requested in parallel. When GitHub advertises the
+    last page in the Link header the remaining pages are requested in parallel too,
+    otherwise pages are followed one at a time until an empty page is returned.
+    
+    Args:
+        session: GitHub API session
+        urls: Endpoint URLs to paginate
+        params: Query parameters shared by every request, or a list with the parameters
+            of each URL
+        max_workers: Maximum number of requests in flight
+        
+    Returns:
+        list: One (items, error) tuple per URL, in input order. items holds every page
+        fetched before the first failed page, error is the exception or None.
+    """
+    results = [None] * len(urls)
+    pending = {}
+    url_params = params if isinstance(params, list) else [params] * len(urls)
+    
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        first_pages = executor.map(lambda i: fetch_page(session, urls[i], url_params[i], 1), range(len(urls)))
+        
+        for i, (url, (response, error)) in enumerate(zip(urls, first_pages)):
+            if error:
+                results[i] = ([], error)
+                continue
+            
+            items = response.json()
+            if not items:
+                results[i] = ([], None)
+                continue
+            
+            last_page = get_last_page(response)
+            if last_page is not None:
+                pending[i] = (items, [
+                    executor.submit(fetch_page, session, url, url_params[i], page)
+                    for page in range(2, last_page + 1)
+                ])
+            elif response.headers.get("Link") and "next" not in response.links:
+                results[i] = (items, None)
+            else:
+                pending[i] = (items, executor.submit(follow_pages, session, url, url_params[i], 2))
+        
+        for i, (items, futures) in pending.items():
+            if not isinstance(futures, list):
+                more_items, error = futures.result()
+                results[i] = (items + more_items, error)
+                continue
+            
+            error = None
+            for future in futures:
+                response, error = future.result()
+                if error:
+                    break
+                items.extend(response.json())
+            results[i] = (items, error)
+    
+    return results
 
-def fetch_org_repos(owner: str, headers: dict) -> list:
+def fetch_org_repos(owner: str, session: requests.Session, base_url: str = GITHUB_API_URL, max_workers: int = 8) -> list:
     """
     Fetches all repositories for an organization.
     
     Args:
         owner: GitHub organization name
-        headers: Request headers including authentication
+        session: GitHub API session including authentication
+        base_url: GitHub API base URL
+        max_workers: Maximum number of concurrent page requests
         
     Returns:
         list: List of repository names
     """
-    github_url = f"https://api.github.com/orgs/{owner}/repos"
-    repos = []
-    page = 1
+    github_url = f"{base_url}/orgs/{owner}/repos"
+    [(repos, error)] = fetch_paginated(
+        session,
+        [github_url],
+        {"per_page": 100, "type": "all"},
+        max_workers
+    )
+    
+    if error:
+        print(f"Error fetching organization repositories: {error}")
+        return []
+    
+    return [repo["name"] for repo in repos]
+
+GRAPHQL_NODE_FIELDS = """
+      nodes {
+        number
+        title
+        body
+        url
+        updatedAt
+        comments(first: $comments) { totalCount nodes { body } }
+      }
+      pageInfo { hasNextPage endCursor }"""
+
+def build_graphql_query(pending: list, page_size: int) -> Tuple[str, dict]:
+    """
+    Builds one GraphQL query fetching the next page of open issues and PRs for several repos.
+    
+    Only open items are requested, matching the REST issues endpoint's default state.
+    
+    Args:
+        pending: (alias, repo, issue_cursor, pr_cursor) tuples, a cursor of False means
+            that connection is exhausted and None means its first page
+        page_size: Number of issues and PRs requested per repo
+        
+    Returns:
+        Tuple[str, dict]: Query text and its variables
+    """
+    declarations = ["$owner: String!", "$since: DateTime!", "$comments: Int!"]
+    variables = {}
+    selections = []
+    
+    for alias, repo, issue_cursor, pr_cursor in pending:
+        declarations.append(f"${alias}_name: String!")
+        variables[f"{alias}_name"] = repo
+        connections = []
+        if issue_cursor is not False:
+            declarations.append(f"${alias}_issues: String")
+            variables[f"{alias}_issues"] = issue_cursor
+            connections.append(
+                f"issues(first: {page_size}, after: ${alias}_issues, states: OPEN, filterBy: {{since: $since}}, "
+                f"orderBy: {{field: UPDATED_AT, direction: DESC}}) {{{GRAPHQL_NODE_FIELDS}\n    }}"
+            )
+        if pr_cursor is not False:
+            declarations.append(f"${alias}_prs: String")
+            variables[f"{alias}_prs"] = pr_cursor
+            connections.append(
+                f"pullRequests(first: {page_size}, after: ${alias}_prs, states: OPEN, "
+                f"orderBy: {{field: UPDATED_AT, direction: DESC}}) {{{GRAPHQL_NODE_FIELDS}\n    }}"
+            )
+        selections.append(f"  {alias}: repository(owner: $owner, name: ${alias}_name) {{\n    " + "\n    ".join(connections) + "\n  }")
+    
+    query = f"query({', '.join(declarations)}) {{\n" + "\n".join(selections) + "\n}"
+    return query, variables
+
+def normalize_graphql_node(node: dict, base_url: str, owner: str, repo: str, pull_request: bool) -> dict:
+    """
+    Converts a GraphQL issue or PR node into the dict shape of the REST issues API.
+    
+    The fetched comments are kept under 'prefetched_comments' so they do not have to
+    be requested again.
+    """
+    issue = {
+        "number": node["number"],
+        "title": node["title"],
+        "body": node["body"],
+        "html_url": node["url"],
+        "updated_at": node["updatedAt"],
+        "comments": node["comments"]["totalCount"],
+        "comments_url": f"{base_url}/repos/{owner}/{repo}/issues/{node['number']}/comments",
+        "prefetched_comments": node["comments"]["nodes"],
+    }
+    if pull_request:
+        issue["pull_request"] = {"html_url": node["url"]}
+    return issue
+
+def fetch_graphql_group(
+    session: requests.Session,
+    base_url: str,
+    owner: str,
+    repos: list,
+    since: datetime,
+    page_size: int = 50,
+    comments_per_issue: int = 30
+) -> list:
+    """
+    Fetches open issues and PRs updated since a given time, with their first comments, for
+    a group of repositories using paged GraphQL queries.
+    
+    Returns:
+        list: One (items, error) tuple per repo, in input order
+    """
+    since_utc = since.astimezone(timezone.utc)
+    issues = {repo: [] for repo in repos}
+    errors = {}
+    cursors = {repo: [None, None] for repo in repos}
     
     while True:
+        pending = [
+            (f"r{i}", repo, *cursors[repo])
+            for i, repo in enumerate(repos)
+            if repo not in errors and cursors[repo] != [False, False]
+        ]
+        if not pending:
+            break
+        
+        query, variables = build_graphql_query(pending, page_size)
+        variables.update({"owner": owner, "since": since_utc.isoformat(), "comments": comments_per_issue})
         try:
-            response = requests.get(
-                github_url, 
-                headers=headers,
-                params={
-                    "page": page, 
-                    "per_page": 100,
-                    "type": "all"
-                }
-            )
+            response = session.post(f"{base_url}/graphql", json={"query": query, "variables": variables})
             response.raise_for_status()
-            page_repos = response.json()
-            
-            if not page_repos:
-                break
-                
-            repos.extend([repo["name"] for repo in page_repos])
-            page += 1
-        except requests.exceptions.RequestException as e:
-            print(f"Error fetching organization repositories: {e}")
-            return []
+            payload = response.json()
+        except (requests.exceptions.RequestException, ValueError) as e:
+            for _, repo, _, _ in pending:
+                errors[repo] = e
+            break
+        
+        data = payload.get("data") or {}
+        for alias, repo, _, _ in pending:
+            repository = data.get(alias)
+            if not repository:
+                messages = [error.get("message", "") for error in payload.get("errors", [])]
+                errors[repo] = RuntimeError(f"GraphQL query failed: {'; '.join(messages) or 'no data'}")
+                continue
             
-    return repos
+            for index, (field, pull_request) in enumerate((("issues", False), ("pullRequests", True))):
+                connection = repository.get(field)
+                if connection is None:
+                    continue
+                reached_since = False
+                for node in connection["nodes"]:
+                    # pullRequests has no since filter, results are ordered by update time
+                    if parse_github_time(node["updatedAt"]) < since_utc:
+                        reached_since = True
+                        break
+                    issues[repo].append(normalize_graphql_node(node, base_url, owner, repo, pull_request))
+                page_info = connection["pageInfo"]
+                has_more = page_info["hasNextPage"] and not reached_since
+                cursors[repo][index] = page_info["endCursor"] if has_more else False
+    
+    results = []
+    for repo in repos:
+        # Match the REST API's default newest-first ordering
+        repo_issues = sorted(issues[repo], key=lambda issue: issue["number"], reverse=True)
+        results.append((repo_issues, errors.get(repo)))
+    return results
+
+def fetch_graphql_issues(
+    session: requests.Session,
+    base_url: str,
+    owner: str,
+    repos: list,
+    since: datetime | dict,
+    config: dict,
+    max_workers: int = 8
+) -> list:
+    """
+    Fetches issues and PRs with their comments through the GitHub GraphQL API, querying
+    several repos per request and running the repo groups concurrently.
+    
+    since is either shared by all repos or maps each repo to its own start time. Repos
+    are only grouped into a query with repos that share their start time.
+    
+    Returns:
+        list: One (items, error) tuple per repo, in input order
+    """
+    github_config = config['api']['github']
+    group_size = github_config['graphql_repos_per_query']
+    repo_since = since if isinstance(since, dict) else dict.fromkeys(repos, since)
+    windows = {}
+    for repo in repos:
+        windows.setdefault(repo_since[repo], []).append(repo)
+    groups = [
+        (window_since, window_repos[i:i + group_size])
+        for window_since, window_repos in windows.items()
+        for i in range(0, len(window_repos), group_size)
+    ]
+    
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        group_results = executor.map(
+            lambda group: fetch_graphql_group(
+                session,
+                base_url,
+                owner,
+                group[1],
+                group[0],
+                github_config['graphql_page_size'],
+                github_config['graphql_comments_per_issue']
+            ),
+            groups
+        )
+        results = {
+            repo: result
+            for (_, group_repos), group_result in zip(groups, group_results)
+            for repo, result in zip(group_repos, group_result)
+        }
+        return [results[repo] for repo in repos]
 
 def fetch_github_issues(
     github_token: str,
     owner: str,
     repo: str | None,
     last_run_file: Path,
-    config: dict
+    config: dict,
+    session: requests.Session = None,
+    watermarks: WatermarkStore = None,
+    metrics: RunMetrics = None
 ) -> list:
     """
     Fetches GitHub issues created or updated since the last run time.
     
+    Repositories and their pages are fetched concurrently over a pooled session, the
+    returned issues keep the same order as fetching them one page at a time.
+    
     Args:
         github_token: GitHub authentication token
         owner: GitHub organization/owner name
         repo: Specific repository name or None to fetch from all repos
         last_run_file: Path to the file storing last run timestamp
         config: Configuration dictionary
+        session: Optional GitHub API session to reuse
+        watermarks: Optional watermark store. Each repo is then fetched from its own
+            watermark, issues without a newer update are skipped, and the new
+            watermarks are staged in the store.
+        metrics: Optional run metrics, recording the fetch_repos and fetch_issues stages
     """
     since = get_last_run_time(last_run_file, config)
-    headers = {"Authorization": f"token {github_token}"}
-    
-    try:
-        # Test token with a simple API call
-        test_response = requests.get("https://api.github.com/user", headers=headers)
-        test_response.raise_for_status()
-    except requests.exceptions.RequestException:
-        print("Error: Invalid GitHub token or API access issue")
-        return []
+    base_url = config['api']['github']['base_url']
+    max_workers = config['processing']['concurrency']['github_workers']
+    session = session or create_github_session(github_token, max_workers)
+    metrics = metrics or RunMetrics()
     
+    with metrics.stage("fetch_repos", session):
+        try:
+            # Test token with a simple API call
+            test_response = session.get(f"{base_url}/user")
+            test_response.raise_for_status()
+        except requests.exceptions.RequestException:
+            print("Error: Invalid GitHub token or API access issue")
+            return []
+        
+        if repo:
+            repos_to_check = [repo]
+        else:
+            repos_to_check = fetch_org_repos(owner, session, base_url, max_workers)
+            print(f"Found {len(repos_to_check)} repositories in organization")
+        metrics.count("fetch_repos", repos=len(repos_to_check))
+    
+    with metrics.stage("fetch_issues", session):
+        all_issues = fetch_repo_issues(owner, repos_to_check, since, config, session, watermarks)
+        metrics.count("fetch_issues", issues=len(all_issues))
+    return all_issues
+
+def fetch_repo_issues(
+    owner: str,
+    repos_to_check: list,
+    since: datetime,
+    config: dict,
+    session: requests.Session,
+    watermarks: WatermarkStore = None
+) -> list:
+    """
+    Fetches the issues of the given repositories, see fetch_github_issues.
+    """
+    base_url = config['api']['github']['base_url']
+    max_workers = config['processing']['concurrency']['github_workers']
     all_issues = []
-    repos_to_check = []
     
-    if repo:
-        repos_to_check = [repo]
+    # Repos without a watermark yet start from the last run time
+    repo_since = {
+        repo: ((watermarks.repo_since(owner, repo) if watermarks else None) or since).astimezone(timezone.utc)
+        for repo in repos_to_check
+    }
+    fetch_started = datetime.now(timezone.utc) - WATERMARK_OVERLAP
+    
+    if config['api']['github']['fetch_backend'] == 'graphql':
+        results = fetch_graphql_issues(session, base_url, owner, repos_to_check, repo_since, config, max_workers)
     else:
-        repos_to_check = fetch_org_repos(owner, headers)
-        print(f"Found {len(repos_to_check)} repositories in organization")
+        results = fetch_paginated(
+            session,
+            [f"{base_url}/repos/{owner}/{repo}/issues" for repo in repos_to_check],
+            [{"since": repo_since[repo].isoformat()} for repo in repos_to_check],
+            max_workers
+        )
     
-    for repo in repos_to_check:
-        github_url = f"https://api.github.com/repos/{owner}/{repo}/issues"
-        params = {"since": since.isoformat()}
-        page = 1
+    for repo, (repo_issues, error) in zip(repos_to_check, results):
+        if error:
+            print(f"Error fetching GitHub issues for repo {repo}, results are incomplete: {error}")
         
-        repo_issues = []  # Track issues for current repo
-        while True:
-            params["page"] = page
-            try:
-                response = requests.get(github_url, headers=headers, params=params)
-                response.raise_for_status()
-                page_issues = response.json()
-                if not page_issues:
-                    break
-                
-                # Add repo name to each issue for better context
-                for issue in page_issues:
-                    issue['repository_name'] = repo
-                
-                repo_issues.extend(page_issues)  
-                page += 1
-            except requests.exceptions.RequestException as e:
-                print(f"Error fetching GitHub issues for repo {repo}: {e}")
-                break  
+        skipped = 0
+        if watermarks:
+            changed = watermarks.filter_changed(owner, repo, repo_issues)
+            skipped = len(repo_issues) - len(changed)
+            repo_issues = changed
+            # A failed repo keeps its watermark, so its whole window is fetched again
+            watermarks.stage(owner, repo, repo_issues, None if error else fetch_started)
+        
+        # Add repo name to each issue for better context
+        for issue in repo_issues:
+            issue['repository_name'] = repo
                 
-        print(f"Found {len(repo_issues)} issues/PRs in {repo}")
+        print(f"Found {len(repo_issues)} issues/PRs in {repo}" + (f" ({skipped} unchanged skipped)" if skipped else ""))
         all_issues.extend(repo_issues) 
     
     return all_issues
 
-def fetch_issue_comments(comments_url: str, headers: dict, token_limit: int) -> str:
+def get_issue_comments(comments_url: str, session: requests.Session) -> list:
     """
-    Retrieves and concatenates comments for a GitHub issue, respecting token limits.
+    Retrieves the comments of a GitHub issue.
     
     Args:
         comments_url: URL endpoint for the issue's comments
-        headers: Request headers including authentication
+        session: GitHub API session including authentication
+        
+    Returns:
+        list: Comment objects, or an empty list if the request fails
+    """
+    try:
+        response = session.get(comments_url)
+        response.raise_for_status()
+        return response.json()
+    except requests.exceptions.RequestException as e:
+        print(f"Error fetching comments from {comments_url}: {e}")
+        return []
+
+def join_comments(comments: list, token_limit: int) -> str:
+    """
+    Concatenates comment bodies, stopping before the token limit is exceeded.
+    
+    Args:
+        comments: Comment objects as returned by the GitHub API
         token_limit: Maximum number of tokens allowed
         
     Returns:
         str: Concatenated comments text, separated by '---'
     """
-    comments_text = ""
-    response = requests.get(comments_url, headers=headers)
-    comments = response.json()
+    return join_comments_counted(comments, token_limit)[0]
+
+def join_comments_counted(comments: list, token_limit: int) -> Tuple[str, int]:
+    """
+    Concatenates comment bodies like join_comments and also returns their token count.
+    
+    Keeps a running token total instead of re-encoding the joined text for every
+    comment. Each comment is encoded once together with its '---' separator and the
+    last words of the text so far, so the total always equals calculate_tokens() of
+    the joined text.
+    
+    Returns:
+        Tuple[str, int]: Concatenated comments text and its number of tokens
+    """
+    parts = []
+    total_tokens = 0
+    tail = ""
+    tail_tokens = 0
     
     for comment in comments:
         comment_body = comment.get("body", "")
-        current_tokens = calculate_tokens(comments_text)
-        new_comment_tokens = calculate_tokens(comment_body)
+        piece = f"\n---\n{comment_body}" if total_tokens else comment_body
+        window = tail + piece
+        new_total = total_tokens - tail_tokens + calculate_tokens(window)
         
-        if current_tokens + new_comment_tokens > token_limit:
+        if new_total > token_limit:
             print("Token limit reached for comments.")
             break
         
-        if comments_text:
-            comments_text += "\n---\n"
-        comments_text += comment_body
+        parts.append(piece)
+        total_tokens = new_total
+        tail = window[find_token_tail(window):]
+        tail_tokens = calculate_tokens(tail)
     
-    return comments_text
+    return "".join(parts), total_tokens
 
-def prepare_klusterai_job(
-    model: str,
-    requests: list,
-    batch_dir: str = "batch_files"
-) -> Tuple[list, Path]:
+SUMMARY_SYSTEM_PROMPT = (
+    "You are a helpful assistant that summarizes GitHub issues and PRs. "
+    "IMPORTANT: Only include information that is explicitly present in the provided text. "
+    "Do not make assumptions or add information that isn't directly stated.\n\n"
+    "For each issue/PR, structure your response as follows:\n"
+    "1. Start with a brief TL;DR (1-2 sentences)\n"
+    "2. Provide a detailed summary of the main points, using only information from the source\n"
+    "3. If code samples are present, highlight important code samples exactly as shown\n"
+    "4. List any explicitly mentioned action items or pending questions\n"
+    "5. [AI Suggestions] Clearly mark any AI-generated suggestions with this prefix\n\n"
+    "Formatting guidelines:\n"
+    "- Use single * for bold text (Slack format), never use **\n"
+    "- Use triple backticks for code blocks without language specifiers\n"
+    "- Use > for quotes or important highlights\n"
+    "- Use bullet points (-) for lists\n\n"
+    "If the issue is a question:\n"
+    "1. Summarize the question exactly as presented\n"
+    "2. If providing an answer not found in the text, prefix with '[AI Suggestions]'\n"
+    "3. If the question remains open, note it in the action items\n\n"
+    "Keep summaries factual and based solely on the provided content. "
+    "If suggesting additional context or solutions, clearly mark them as '*AI's Note:*' "
+    "to distinguish them from the original content."
+)
+
+def iter_klusterai_tasks(model: str, requests: list):
     """
-    Prepares a list of requests for kluster.ai batch processing and saves them to a file.
+    Lazily builds one kluster.ai batch task per issue.
     
-    Returns:
-        Tuple[list, Path]: List of tasks and the directory path containing the files
+    Yields:
+        dict: Batch task with the summarization prompt and the issue metadata
     """
-    
-    tasks = []
-    
     for i, request in enumerate(requests):
         title = request.get("title", "")
         body = request.get("body", "")
@@ -337,36 +1346,14 @@ def prepare_klusterai_job(
         repo_name = request.get("repository_name", "")
         comments_text = request.get("comments_text", "")
         
-        task = {
+        yield {
             "custom_id": f"issue-{i+1}",
             "method": "POST",
             "url": "/v1/chat/completions",
             "body": {
                 "model": model,
                 "messages": [
-                    {"role": "system", "content": (
-                        "You are a helpful assistant that summarizes GitHub issues and PRs. "
-                        "IMPORTANT: Only include information that is explicitly present in the provided text. "
-                        "Do not make assumptions or add information that isn't directly stated.\n\n"
-                        "For each issue/PR, structure your response as follows:\n"
-                        "1. Start with a brief TL;DR (1-2 sentences)\n"
-                        "2. Provide a detailed summary of the main points, using only information from the source\n"
-                        "3. If code samples are present, highlight important code samples exactly as shown\n"
-                        "4. List any explicitly mentioned action items or pending questions\n"
-                        "5. [AI Suggestions] Clearly mark any AI-generated suggestions with this prefix\n\n"
-                        "Formatting guidelines:\n"
-                        "- Use single * for bold text (Slack format), never use **\n"
-                        "- Use triple backticks for code blocks without language specifiers\n"
-                        "- Use > for quotes or important highlights\n"
-                        "- Use bullet points (-) for lists\n\n"
-                        "If the issue is a question:\n"
-                        "1. Summarize the question exactly as presented\n"
-                        "2. If providing an answer not found in the text, prefix with '[AI Suggestions]'\n"
-                        "3. If the question remains open, note it in the action items\n\n"
-                        "Keep summaries factual and based solely on the provided content. "
-                        "If suggesting additional context or solutions, clearly mark them as '*AI's Note:*' "
-                        "to distinguish them from the original content."
-                    )},
+                    {"role": "system", "content": SUMMARY_SYSTEM_PROMPT},
                     {"role": "user", "content": f"Repository: {repo_name}\nTitle: {title}\nBody: {body}\nComments: {comments_text}"},
                 ],
             },
@@ -376,30 +1363,322 @@ def prepare_klusterai_job(
                 "repo_name": repo_name
             }
         }
-        tasks.append(task)
 
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
-    file_dir = Path(batch_dir) / timestamp
-    file_dir.mkdir(parents=True, exist_ok=True)
+class JsonlShardWriter:
+    """
+    Writes JSONL lines to numbered shard files, starting a new shard whenever the
+    current one would exceed max_lines lines or max_bytes bytes.
+    """
+    
+    def __init__(self, file_dir: Path, prefix: str, max_lines: int, max_bytes: int):
+        self.file_dir = file_dir
+        self.prefix = prefix
+        self.max_lines = max_lines
+        self.max_bytes = max_bytes
+        self.paths = []
+        self.file = None
+        self.lines = 0
+        self.bytes = 0
+    
+    def write(self, line: str) -> None:
+        size = len(line.encode("utf-8"))
+        if self.file is None or self.lines >= self.max_lines or (self.lines and self.bytes + size > self.max_bytes):
+            self.close()
+            path = self.file_dir / f"{self.prefix}_{len(self.paths):03d}.jsonl"
+            self.paths.append(path)
+            self.file = open(path, "w")
+            self.lines = 0
+            self.bytes = 0
+        self.file.write(line)
+        self.lines += 1
+        self.bytes += size
+    
+    def close(self) -> None:
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
+
+def list_input_shards(file_dir: Path) -> list:
+    """
+    Returns the batch input shards of a run, in custom_id order.
+    """
+    return sorted(file_dir.glob("batch_input_*.jsonl"))
+
+def prepare_klusterai_job(
+    model: str,
+    requests: list,
+    batch_dir: str = "batch_files",
+    cache_dir: Path = None,
+    shard_max_requests: int = 10000,
+    shard_max_mb: int = 100,
+    file_dir: Path = None,
+    dedupe: bool = True,
+    metrics: RunMetrics = None
+) -> Path:
+    """
+    Prepares a list of requests for kluster.ai batch processing and saves them to a file.
+    
+    Tasks are generated and written one at a time, so the full task list is never held
+    in memory. The metadata of every task is also written to batch_metadata.jsonl, which
+    lets results be matched to issues without re-reading the prompts. When a summary
+    cache directory is given, requests whose prompt and model were already summarized
+    are written to cached_results.jsonl instead of the batch input.
     
-    input_path = file_dir / "batch_input.jsonl"
+    The batch input is split into batch_input_<n>.jsonl shards of at most
+    shard_max_requests requests and shard_max_mb megabytes each, so large backfills
+    stay within upload limits and can run as parallel jobs.
+    
+    With dedupe set, a request whose body (model and full prompt) is identical to an
+    earlier one is not submitted again. Its metadata entry records the custom_id of that
+    earlier request as duplicate_of, and the earlier result is fanned out to it.
+    
+    With metrics, the submitted requests and their input tokens are counted in the
+    prepare stage, along with cache hits and duplicates. A request's tokens are taken
+    from its input_tokens, as counted by process_issues_content, and only encoded here
+    when it has none. Tokens merging across the joined parts of the prompt are not
+    accounted for, so the count can be off by a few tokens per request.
+    
+    Returns:
+        Path: The directory path containing the files, a new timestamped directory in
+        batch_dir unless file_dir is given
+    """
+    if file_dir is None:
+        file_dir = Path(batch_dir) / datetime.now().strftime(RUN_DIR_FORMAT)
+    file_dir.mkdir(parents=True, exist_ok=True)
+    frame_tokens = calculate_tokens(SUMMARY_SYSTEM_PROMPT) + calculate_tokens("\nComments: ") if metrics else 0
+    
+    metadata_path = file_dir / "batch_metadata.jsonl"
+    cached_path = file_dir / "cached_results.jsonl"
+    total = 0
+    hits = 0
+    unique = {}
+    duplicates = 0
+    duplicate_chars = 0
 
     try:
-        with open(input_path, "w") as file:
-            for task in tasks:
+        with (
+            JsonlShardWriter(file_dir, "batch_input", shard_max_requests, shard_max_mb * 1024 * 1024) as file,
+            open(metadata_path, "w") as metadata_file,
+            open(cached_path, "w") as cached_file
+        ):
+            for task, request in zip(iter_klusterai_tasks(model, requests), requests):
+                total += 1
+                cache_key = summary_cache_key(task["body"]) if cache_dir or dedupe else None
+                if cache_dir:
+                    task["metadata"]["cache_key"] = cache_key
+                if dedupe and cache_key in unique:
+                    task["metadata"]["duplicate_of"] = unique[cache_key]
+                    duplicates += 1
+                    duplicate_chars += len(task["body"]["messages"][-1]["content"])
+                elif dedupe:
+                    unique[cache_key] = task["custom_id"]
+                metadata_file.write(json.dumps({"custom_id": task["custom_id"], "metadata": task["metadata"]}) + "\n")
+                if "duplicate_of" in task["metadata"]:
+                    continue
+                if cache_dir:
+                    summary = get_cached_summary(cache_dir, cache_key)
+                    if summary is not None:
+                        cached_file.write(json.dumps(cached_result(task, summary)) + "\n")
+                        hits += 1
+                        continue
                 file.write(json.dumps(task) + "\n")
+                if metrics:
+                    input_tokens = request.get("input_tokens")
+                    if input_tokens is None:
+                        input_tokens = calculate_tokens(task["body"]["messages"][-1]["content"])
+                    metrics.count("prepare", requests=1, input_tokens=frame_tokens + input_tokens)
     except IOError as e:
         print(f"Error writing batch file: {e}")
         return None
+    
+    if metrics:
+        metrics.count("prepare", cached=hits, duplicates=duplicates)
+
+    if dedupe:
+        print(f"Deduplication: {duplicates} of {total} requests repeat an earlier prompt, "
+              f"{total - duplicates} unique ({duplicate_chars} prompt characters not sent)")
+    if cache_dir:
+        print(f"Summary cache: {hits} hits, {total - duplicates - hits} to summarize")
+    if len(file.paths) > 1:
+        print(f"Split {total - duplicates - hits} requests into {len(file.paths)} batch shards")
 
     return file_dir
 
-def ensure_batch_directory(batch_dir: str = "batch_files") -> Path:
+def iter_jsonl(path: Path):
     """
-    Creates and returns the batch directory path if it doesn't exist.
+    Lazily parses a JSONL file, skipping blank lines.
     
-    Args:
-        batch_dir: Name of the directory to store batch files
+    Yields:
+        dict: One parsed object per line
+    """
+    with open(path, "r") as file:
+        for line in file:
+            if line.strip():
+                yield json.loads(line)
+
+def iter_batch_results(file_dir: Path):
+    """
+    Lazily yields the summaries of a run, from the cache and from the batch output.
+    
+    Yields:
+        Tuple[str, dict]: custom_id and the response of each result
+    """
+    for path in (file_dir / "cached_results.jsonl", file_dir / "batch_results.jsonl"):
+        if path.exists():
+            for result in iter_jsonl(path):
+                yield result.get("custom_id", "N/A"), result.get("response", {})
+
+def unsummarized_issues(file_dir: Path) -> set:
+    """
+    Returns the (repository, number) of each issue of a run without a successful result,
+    for example because its request failed or its shard produced no output.
+    """
+    issue_metadata = load_issue_metadata(file_dir)
+    for custom_id, response in fan_out_results(iter_batch_results(file_dir), load_duplicates(file_dir)):
+        if response.get("status_code") == 200:
+            issue_metadata.pop(custom_id, None)
+    
+    missing = set()
+    for issue_url, _, repo_name in issue_metadata.values():
+        number = issue_url.rstrip("/").rsplit("/", 1)[-1]
+        missing.add((repo_name, int(number) if number.isdigit() else number))
+    return missing
+
+def load_duplicates(file_dir: Path) -> dict:
+    """
+    Maps the custom_id of each submitted request to the custom_ids of the requests
+    that were deduplicated into it.
+    """
+    duplicates = {}
+    for entry in iter_jsonl(file_dir / "batch_metadata.jsonl"):
+        original = entry.get("metadata", {}).get("duplicate_of")
+        if original:
+            duplicates.setdefault(original, []).append(entry["custom_id"])
+    return duplicates
+
+def fan_out_results(results, duplicates: dict):
+    """
+    Yields every (custom_id, response) result, followed by a copy for each request
+    that was deduplicated into it.
+    """
+    for custom_id, response in results:
+        yield custom_id, response
+        for duplicate_id in duplicates.get(custom_id, ()):
+            yield duplicate_id, response
+
+def summary_cache_key(task_body: dict) -> str:
+    """
+    Hashes a request body, covering both the model and the full prompt.
+    """
+    return hashlib.sha256(json.dumps(task_body, sort_keys=True).encode()).hexdigest()
+
+def get_cached_summary(cache_dir: Path, cache_key: str) -> str | None:
+    """
+    Looks up a stored summary in the summary cache.
+    
+    Args:
+        cache_dir: Directory holding the summary cache
+        cache_key: Key returned by summary_cache_key
+        
+    Returns:
+        str | None: The cached summary, or None on a cache miss
+    """
+    try:
+        with open(Path(cache_dir) / f"{cache_key}.json", "r") as f:
+            return json.load(f)["summary"]
+    except (FileNotFoundError, ValueError, KeyError):
+        return None
+
+def cached_result(task: dict, summary: str) -> dict:
+    """
+    Builds a batch result line for a summary served from the cache.
+    """
+    return {
+        "custom_id": task["custom_id"],
+        "response": {
+            "status_code": 200,
+            "body": {"choices": [{"message": {"content": summary}}]}
+        },
+        "cached": True
+    }
+
+def store_cached_summaries(file_dir: Path, cache_dir: Path, model: str) -> None:
+    """
+    Stores the successful summaries of a completed batch in the summary cache.
+    
+    Args:
+        file_dir: Directory containing the input and output files
+        cache_dir: Directory holding the summary cache
+        model: Model that produced the summaries
+    """
+    cache_dir = Path(cache_dir)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    
+    cache_keys = {
+        entry["custom_id"]: entry["metadata"].get("cache_key")
+        for entry in iter_jsonl(file_dir / "batch_metadata.jsonl")
+    }
+    
+    stored = 0
+    for result in iter_jsonl(file_dir / "batch_results.jsonl"):
+        cache_key = cache_keys.get(result.get("custom_id"))
+        response = result.get("response", {})
+        if not cache_key or response.get("status_code") != 200:
+            continue
+        try:
+            summary = response["body"]["choices"][0]["message"]["content"]
+        except (KeyError, IndexError, TypeError):
+            continue
+        with open(cache_dir / f"{cache_key}.json", "w") as f:
+            json.dump({"model": model, "summary": summary}, f)
+        stored += 1
+    
+    print(f"Stored {stored} summaries in cache {cache_dir}")
+
+def evict_summary_cache(cache_dir: Path, max_age_days: int = 30, max_size_mb: int = 100) -> None:
+    """
+    Removes cached summaries older than max_age_days, then the oldest remaining
+    entries until the cache fits within max_size_mb.
+    """
+    cache_dir = Path(cache_dir)
+    if not cache_dir.exists():
+        return
+    
+    cutoff = time.time() - max_age_days * 86400
+    entries = []
+    for entry in cache_dir.glob("*.json"):
+        try:
+            stat = entry.stat()
+            if stat.st_mtime < cutoff:
+                entry.unlink()
+            else:
+                entries.append((stat.st_mtime, stat.st_size, entry))
+        except OSError as e:
+            print(f"Error evicting cache entry {entry}: {e}")
+    
+    total_size = sum(size for _, size, _ in entries)
+    max_size = max_size_mb * 1024 * 1024
+    for _, size, entry in sorted(entries):
+        if total_size <= max_size:
+            break
+        try:
+            entry.unlink()
+            total_size -= size
+        except OSError as e:
+            print(f"Error evicting cache entry {entry}: {e}")
+
+def ensure_batch_directory(batch_dir: str = "batch_files") -> Path:
+    """
+    Creates and returns the batch directory path if it doesn't exist.
+    
+    Args:
+        batch_dir: Name of the directory to store batch files
         
     Returns:
         Path: Path object for the batch directory
@@ -408,100 +1687,947 @@ def ensure_batch_directory(batch_dir: str = "batch_files") -> Path:
     batch_path.mkdir(exist_ok=True)
     return batch_path
 
-def cleanup_batch_files(keep_days: int = 7, batch_dir: str = "batch_files") -> None:
+def cleanup_batch_files(keep_days: int = 7, batch_dir: str = "batch_files", store: "ArtifactStore" = None) -> None:
     """
-    Removes batch directories older than specified days.
+    Removes the run directories created more than keep_days ago, or all of them with
+    keep_days 0. Runs are looked up in the artifact index, not by walking batch_dir.
     """
-    batch_path = Path(batch_dir)
+    index = store or ArtifactStore(batch_dir)
+    cutoff = time.time() if keep_days == 0 else time.time() - keep_days * 86400
+    try:
+        for run in index.runs_created_before(cutoff):
+            try:
+                index.remove(run)
+                print(f"Cleaned up old directory: {index.batch_dir / run}")
+            except OSError as e:
+                print(f"Error cleaning up {index.batch_dir / run}: {e}")
+    finally:
+        # An index opened here is closed here, a given one stays open for the caller
+        if store is None:
+            index.close()
+
+class RunJournal:
+    """
+    Crash-safe record of how far a run has progressed.
+    
+    Every finished step (issues fetched, shard submitted, shard finished, results merged,
+    message posted, run completed) is appended to run_journal.jsonl in the run's
+    directory and fsynced before the run moves on. After a crash, the next run picks up
+    at the first incomplete step instead of fetching the issues and paying for the batch
+    jobs again. A line torn by a crash mid-write is dropped on load.
+    
+    With lock set, the journal is created if needed and exclusively locked with flock
+    before it is read, raising BlockingIOError if another process holds it. The lock
+    is held until close() or the process exits, so a run that is still going is never
+    resumed by an overlapping run.
+    """
+    
+    FILE_NAME = "run_journal.jsonl"
     
-    if keep_days == 0:
-        # Immediate deletion of all run directories
-        for dir_path in batch_path.iterdir():
-            if dir_path.is_dir():
+    def __init__(self, file_dir: Path, lock: bool = False):
+        self.path = file_dir / self.FILE_NAME
+        self.entries = []
+        self.lock = threading.Lock()
+        self.lock_file = None
+        if lock:
+            self.lock_file = open(self.path, "ab")
+            if fcntl:
                 try:
-                    shutil.rmtree(dir_path)
-                    print(f"Cleaned up directory: {dir_path}")
-                except Exception as e:
-                    print(f"Error cleaning up {dir_path}: {e}")
-        return
+                    fcntl.flock(self.lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    self.lock_file.close()
+                    raise
+        if not self.path.exists():
+            return
         
-    # Normal cleanup for keep_days > 0
-    cutoff_time = datetime.now() - timedelta(days=keep_days)
-    for dir_path in batch_path.iterdir():
-        if not dir_path.is_dir():
-            continue
-            
-        try:
-            dir_time = datetime.strptime(dir_path.name, "%Y%m%d_%H%M%S_%f")
-            if dir_time < cutoff_time:
-                shutil.rmtree(dir_path)
-                print(f"Cleaned up old directory: {dir_path}")
-        except (ValueError, OSError) as e:
-            print(f"Error processing {dir_path}: {e}")
+        with open(self.path, "rb+") as file:
+            data = file.read()
+            end = data.rfind(b"\n") + 1
+            if end < len(data):
+                file.truncate(end)
+        self.entries = [json.loads(line) for line in data[:end].splitlines() if line.strip()]
+    
+    def record(self, stage: str, **data) -> None:
+        entry = {"stage": stage, "time": time.time(), **data}
+        with self.lock:
+            with open(self.path, "a") as file:
+                file.write(json.dumps(entry) + "\n")
+                file.flush()
+                os.fsync(file.fileno())
+            self.entries.append(entry)
+    
+    def find(self, stage: str) -> list:
+        return [entry for entry in self.entries if entry["stage"] == stage]
+    
+    def has(self, stage: str) -> bool:
+        return bool(self.find(stage))
+    
+    def submitted(self) -> dict:
+        return {entry["shard"]: entry["batch_id"] for entry in self.find("submitted")}
+    
+    def finished(self) -> dict:
+        return {entry["shard"]: entry["status"] for entry in self.find("finished")}
+    
+    def posted(self, key: str) -> set:
+        return {entry[key] for entry in self.find("posted") if key in entry}
+    
+    def close(self) -> None:
+        if self.lock_file:
+            self.lock_file.close()
+            self.lock_file = None
+    
+    def thread_parents(self) -> dict:
+        return {entry["parent"]: entry["ts"] for entry in self.find("posted") if "parent" in entry}
+    
+    def thread_replies(self, repo_name: str) -> set:
+        return {entry["reply"] for entry in self.find("posted") if entry.get("thread") == repo_name}
 
-def monitor_batch_status(client, batch_id: str, interval: int = 10) -> dict:
+def compress_jsonl(path: Path, block_lines: int = 128) -> list:
+    """
+    Writes a gzip-compressed copy of a JSONL file next to it, as path.gz.
+    
+    Every block_lines lines are compressed as a separate gzip member. Concatenated
+    members are still one valid gzip file, and each block can be decompressed on its own.
+    
+    Returns:
+        list: (custom_id, offset, length) of the block holding each line
+    """
+    entries = []
+    with open(path, "rb") as source, open(path.with_name(path.name + ".gz"), "wb") as target:
+        for block in iter(lambda: list(itertools.islice(source, block_lines)), []):
+            data = gzip.compress(b"".join(block), mtime=0)
+            offset = target.tell()
+            target.write(data)
+            entries.extend(
+                (json.loads(line).get("custom_id"), offset, len(data))
+                for line in block if line.strip()
+            )
+    return entries
+
+class ArtifactStore:
+    """
+    Index of the run directories in a batch directory and of the entries they hold,
+    kept in SQLite as index.db.
+    
+    Runs are registered when they start and marked once they complete. The JSONL files
+    of a completed run are then gzip-compressed in blocks (see compress_jsonl) and the
+    block of every result and metadata entry is indexed by custom_id, so a single summary
+    is read by decompressing one block. Cleanup and resuming find runs in the index
+    instead of walking the directory tree. The run journal is kept uncompressed.
+    
+    Run directories from before the index existed are registered when it is created.
+    Every run is registered with the configuration that started it and only resumed by
+    that configuration, so configurations sharing a batch directory do not pick up each
+    other's runs.
+    """
+    
+    FILE_NAME = "index.db"
+    INDEXED_FILES = ("batch_results.jsonl", "cached_results.jsonl", "batch_metadata.jsonl")
+    BLOCK_LINES = 128
+    
+    def __init__(self, batch_dir: str = "batch_files"):
+        self.batch_dir = Path(batch_dir)
+        self.batch_dir.mkdir(parents=True, exist_ok=True)
+        path = self.batch_dir / self.FILE_NAME
+        new = not path.exists()
+        self.connection = sqlite3.connect(path)
+        with self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS runs "
+                "(run TEXT PRIMARY KEY, created REAL, completed REAL, archived REAL, bytes INTEGER, config TEXT)"
+            )
+            columns = [row[1] for row in self.connection.execute("PRAGMA table_info(runs)")]
+            if "config" not in columns:
+                self.connection.execute("ALTER TABLE runs ADD COLUMN config TEXT")
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS entries "
+                "(run TEXT, file TEXT, custom_id TEXT, offset INTEGER, length INTEGER, PRIMARY KEY (run, file, custom_id))"
+            )
+        if new:
+            self.register_existing()
+    
+    def register_existing(self) -> None:
+        for dir_path in self.batch_dir.iterdir():
+            if not dir_path.is_dir():
+                continue
+            try:
+                created = datetime.strptime(dir_path.name, RUN_DIR_FORMAT).timestamp()
+            except ValueError:
+                continue
+            completed = created
+            if (dir_path / RunJournal.FILE_NAME).exists():
+                entries = RunJournal(dir_path).find("completed")
+                completed = entries[0]["time"] if entries else None
+            with self.connection:
+                self.connection.execute(
+                    "INSERT OR IGNORE INTO runs (run, created, completed) VALUES (?, ?, ?)", (dir_path.name, created, completed)
+                )
+    
+    def register(self, run_dir: Path, config: str = None) -> None:
+        created = datetime.strptime(run_dir.name, RUN_DIR_FORMAT).timestamp()
+        with self.connection:
+            self.connection.execute(
+                "INSERT OR IGNORE INTO runs (run, created, config) VALUES (?, ?, ?)", (run_dir.name, created, config)
+            )
+    
+    def complete(self, run_dir: Path, completed: float = None) -> None:
+        with self.connection:
+            self.connection.execute(
+                "UPDATE runs SET completed = ? WHERE run = ?", (completed or time.time(), run_dir.name)
+            )
+    
+    def incomplete_run(self, config: str = None) -> "RunJournal | None":
+        """
+        Returns the locked journal of the configuration's latest run if that run was
+        interrupted before completing.
+        
+        Runs that stopped before they had a journal have nothing to resume and are skipped,
+        and so are runs whose journal is locked by a process that is still working on them.
+        """
+        rows = self.connection.execute(
+            "SELECT run, completed FROM runs WHERE config IS ? ORDER BY created DESC", (config,)
+        ).fetchall()
+        for run, completed in rows:
+            if completed is not None:
+                return None
+            run_dir = self.batch_dir / run
+            if not (run_dir / RunJournal.FILE_NAME).exists():
+                continue
+            try:
+                journal = RunJournal(run_dir, lock=True)
+            except BlockingIOError:
+                print(f"Run {run_dir} is still in progress in another process, not resuming it")
+                continue
+            entries = journal.find("completed")
+            if entries:
+                # Completed, but stopped before the index was updated
+                self.complete(run_dir, entries[0]["time"])
+                journal.close()
+                return None
+            return journal
+        return None
+    
+    def archive(self, run: str) -> None:
+        """
+        Compresses the JSONL files of a completed run and indexes their entries.
+        
+        The uncompressed files are only removed once the index is written, so an
+        interrupted archive is redone from them.
+        """
+        run_dir = self.batch_dir / run
+        paths = [path for path in sorted(run_dir.glob("*.jsonl")) if path.name != RunJournal.FILE_NAME]
+        entries = []
+        for path in paths:
+            blocks = compress_jsonl(path, self.BLOCK_LINES)
+            if path.name in self.INDEXED_FILES:
+                entries.extend((run, path.name, custom_id, offset, length) for custom_id, offset, length in blocks)
+        size = sum(path.stat().st_size for path in run_dir.glob("*.gz"))
+        with self.connection:
+            self.connection.execute("DELETE FROM entries WHERE run = ?", (run,))
+            self.connection.executemany("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)", entries)
+            self.connection.execute("UPDATE runs SET archived = ?, bytes = ? WHERE run = ?", (time.time(), size, run))
+        for path in paths:
+            path.unlink()
+    
+    def archive_completed(self) -> None:
+        """
+        Archives every completed run that is not archived yet.
+        """
+        runs = [row[0] for row in self.connection.execute(
+            "SELECT run FROM runs WHERE completed IS NOT NULL AND archived IS NULL"
+        )]
+        for run in runs:
+            if not (self.batch_dir / run).is_dir():
+                continue
+            try:
+                self.archive(run)
+            except (OSError, ValueError) as e:
+                print(f"Error archiving {self.batch_dir / run}: {e}")
+    
+    def runs_created_before(self, cutoff: float) -> list:
+        return [row[0] for row in self.connection.execute("SELECT run FROM runs WHERE created < ?", (cutoff,))]
+    
+    def remove(self, run: str) -> None:
+        run_dir = self.batch_dir / run
+        if run_dir.exists():
+            shutil.rmtree(run_dir)
+        with self.connection:
+            self.connection.execute("DELETE FROM entries WHERE run = ?", (run,))
+            self.connection.execute("DELETE FROM runs WHERE run = ?", (run,))
+    
+    def read_entry(self, run: str, file: str, custom_id: str) -> dict | None:
+        """
+        Reads one entry of an archived run by decompressing only the block that holds it.
+        """
+        row = self.connection.execute(
+            "SELECT offset, length FROM entries WHERE run = ? AND file = ? AND custom_id = ?", (run, file, custom_id)
+        ).fetchone()
+        if row is None:
+            return None
+        with open(self.batch_dir / run / f"{file}.gz", "rb") as archive:
+            archive.seek(row[0])
+            block = gzip.decompress(archive.read(row[1]))
+        for line in block.splitlines():
+            if line.strip():
+                entry = json.loads(line)
+                if entry.get("custom_id") == custom_id:
+                    return entry
+        return None
+    
+    def lookup(self, run: str, custom_id: str) -> Tuple[dict | None, dict | None]:
+        """
+        Looks up the metadata and result of a request in an archived run. A deduplicated
+        request gets the result of the request it was deduplicated into.
+        
+        Returns:
+            Tuple[dict | None, dict | None]: Metadata and result entries, None if not found
+        """
+        metadata = self.read_entry(run, "batch_metadata.jsonl", custom_id)
+        result_id = (metadata or {}).get("metadata", {}).get("duplicate_of") or custom_id
+        for file in ("batch_results.jsonl", "cached_results.jsonl"):
+            result = self.read_entry(run, file, result_id)
+            if result is not None:
+                return metadata, result
+        return metadata, None
+    
+    def close(self) -> None:
+        self.connection.close()
+
+def find_incomplete_run(batch_dir: str = "batch_files", store: ArtifactStore = None, config: str = None) -> "RunJournal | None":
+    """
+    Returns the locked journal of the configuration's latest run if it was interrupted
+    before completing, see ArtifactStore.incomplete_run.
+    """
+    if store:
+        return store.incomplete_run(config)
+    index = ArtifactStore(batch_dir)
+    try:
+        return index.incomplete_run(config)
+    finally:
+        index.close()
+
+BATCH_TERMINAL_STATUSES = ("completed", "failed", "canceled", "cancelled", "expired")
+
+class BatchProgressTracker:
+    """
+    Tracks the progress of several batch jobs and decides when each one is polled next.
+    
+    Each job's progress rate is measured from its request counts. While a job makes
+    progress it is polled at half its estimated time to completion, so short jobs are
+    noticed quickly and long ones are not polled needlessly. While a job shows no
+    progress its interval backs off exponentially. Intervals are kept between
+    min_interval and max_interval seconds.
+    """
+    
+    def __init__(self, batch_ids: list, min_interval: float = 5, max_interval: float = 120):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.jobs = {
+            batch_id: {"status": None, "interval": min_interval, "next_poll": 0.0, "start": None, "start_completed": 0}
+            for batch_id in batch_ids
+        }
+    
+    @property
+    def pending(self) -> list:
+        return [
+            batch_id for batch_id, job in self.jobs.items()
+            if job["status"] is None or job["status"].status.lower() not in BATCH_TERMINAL_STATUSES
+        ]
+    
+    def due(self, now: float) -> list:
+        return [batch_id for batch_id in self.pending if self.jobs[batch_id]["next_poll"] <= now]
+    
+    def sleep_time(self, now: float) -> float:
+        return max(0.0, min(self.jobs[batch_id]["next_poll"] for batch_id in self.pending) - now)
+    
+    def eta(self, batch_id: str, now: float) -> float | None:
+        """
+        Estimates the seconds left until a job completes, or None without progress data.
+        """
+        job = self.jobs[batch_id]
+        counts = job["status"].request_counts
+        done = counts.completed - job["start_completed"]
+        if job["start"] is None or done <= 0 or now <= job["start"]:
+            return None
+        return (counts.total - counts.completed) / (done / (now - job["start"]))
+    
+    def update(self, batch_status, now: float) -> bool:
+        """
+        Records a polled status and schedules the next poll.
+        
+        Returns:
+            bool: True if the job has just reached a terminal status
+        """
+        job = self.jobs[batch_status.id]
+        previous = job["status"]
+        job["status"] = batch_status
+        completed = batch_status.request_counts.completed
+        if job["start"] is None:
+            job["start"], job["start_completed"] = now, completed
+        
+        if batch_status.status.lower() in BATCH_TERMINAL_STATUSES:
+            return True
+        
+        eta = self.eta(batch_status.id, now)
+        if previous is not None and completed > previous.request_counts.completed and eta is not None:
+            job["interval"] = eta / 2
+        else:
+            job["interval"] = job["interval"] * 2 if previous is not None else self.min_interval
+        job["interval"] = min(self.max_interval, max(self.min_interval, job["interval"]))
+        job["next_poll"] = now + job["interval"]
+        return False
+    
+    def describe(self, batch_id: str, now: float) -> str:
+        status = self.jobs[batch_id]["status"]
+        line = (
+            f"Batch {batch_id} status: {status.status} - "
+            f"Completed requests: {status.request_counts.completed} / {status.request_counts.total}"
+        )
+        eta = self.eta(batch_id, now)
+        if eta is not None and status.status.lower() not in BATCH_TERMINAL_STATUSES:
+            line += f" - ETA {timedelta(seconds=round(eta))}"
+        return line
+
+def iter_batch_updates(client, batch_ids: list, min_interval: float = 5, max_interval: float = 120):
+    """
+    Monitors several batch jobs at once with adaptive polling.
+    
+    Args:
+        client: OpenAI client instance
+        batch_ids: IDs of the batch jobs to monitor
+        min_interval: Shortest time in seconds between two polls of a job
+        max_interval: Longest time in seconds between two polls of a job
+        
+    Yields:
+        Tuple of each polled batch status and whether the job has just finished
+    """
+    tracker = BatchProgressTracker(batch_ids, min_interval, max_interval)
+    
+    while tracker.pending:
+        for batch_id in tracker.due(time.monotonic()):
+            batch_status = client.batches.retrieve(batch_id)
+            finished = tracker.update(batch_status, time.monotonic())
+            print(tracker.describe(batch_id, time.monotonic()))
+            yield batch_status, finished
+        
+        if tracker.pending:
+            time.sleep(tracker.sleep_time(time.monotonic()))
+
+def iter_finished_batches(client, batch_ids: list, min_interval: float = 5, max_interval: float = 120):
+    """
+    Monitors several batch jobs at once, see iter_batch_updates.
+    
+    Yields:
+        Final batch status of each job, as soon as it finishes
+    """
+    for batch_status, finished in iter_batch_updates(client, batch_ids, min_interval, max_interval):
+        if finished:
+            yield batch_status
+
+def batch_result_path(file_dir: Path, batch_id: str) -> Path:
+    return file_dir / f"batch_results_{batch_id}.jsonl"
+
+def iter_partial_results(
+    client,
+    batch_ids: list,
+    file_dir: Path,
+    min_interval: float = 5,
+    max_interval: float = 120,
+    chunk_size: int = 1024 * 1024,
+    partial: bool = True,
+    metrics: RunMetrics = None
+):
+    """
+    Monitors batch jobs and yields their results while the jobs are still running.
+    
+    A job's output file is downloaded once the job has finished and, if partial is set,
+    whenever a running job exposes one (some providers publish partial output) and its
+    completed request count has grown since the last download. Only the lines added since
+    the last download are parsed, and only results that were not seen before are yielded.
+    Each job's output is saved as batch_results_<batch_id>.jsonl, so once a job has
+    completed its file holds all of its results. The error file of a
+    finished job with failed requests is saved as batch_errors_<batch_id>.jsonl. With
+    metrics, status checks are counted in the monitor stage and downloads are recorded as
+    the download stage.
+    
+    Yields:
+        Tuple of (batch_status, finished, new_results), where new_results lists the
+        (custom_id, response) pairs that became available with this update
+    """
+    seen = set()
+    downloaded = {}
+    # Bytes of complete lines of each job's output handled so far
+    parsed = {}
+    metrics = metrics or RunMetrics()
+    
+    for batch_status, finished in iter_batch_updates(client, batch_ids, min_interval, max_interval):
+        completed = batch_status.request_counts.completed
+        new_results = []
+        metrics.count("monitor", requests=1)
+        
+        if getattr(batch_status, "output_file_id", None) and (finished or (partial and completed > downloaded.get(batch_status.id, 0))):
+            downloaded[batch_status.id] = completed
+            result_path = batch_result_path(file_dir, batch_status.id)
+            with metrics.stage("download"):
+                offset = update_result_file(batch_status, client, result_path, parsed.get(batch_status.id, 0), chunk_size)
+                metrics.count("download", requests=1, bytes_received=result_path.stat().st_size)
+            with open(result_path, "rb") as file:
+                file.seek(offset)
+                for line in file:
+                    if not line.endswith(b"\n") and not finished:
+                        # Cut off mid-line, it is handled once the rest of it is downloaded
+                        break
+                    offset += len(line)
+                    if not line.strip():
+                        continue
+                    result = json.loads(line)
+                    custom_id = result.get("custom_id", "N/A")
+                    if custom_id not in seen:
+                        seen.add(custom_id)
+                        new_results.append((custom_id, result.get("response", {})))
+            parsed[batch_status.id] = offset
+        
+        if finished and getattr(batch_status, "error_file_id", None):
+            with metrics.stage("download"):
+                error_path = retrieve_result_file_contents(
+                    batch_status, client, file_dir, chunk_size, f"batch_errors_{batch_status.id}.jsonl",
+                    file_id=batch_status.error_file_id
+                )
+                metrics.count("download", requests=1, bytes_received=error_path.stat().st_size)
+            print(f"{batch_status.request_counts.failed} requests of batch job {batch_status.id} failed, see {error_path}")
+        
+        yield batch_status, finished, new_results
+
+async def aiter_finished_batches(client, batch_ids: list, min_interval: float = 5, max_interval: float = 120):
+    """
+    Asyncio version of iter_finished_batches.
+    
+    Works with both OpenAI and AsyncOpenAI clients, blocking calls of a synchronous
+    client are run in a worker thread. Jobs that are due are polled concurrently.
+    
+    Yields:
+        Final batch status of each job, as soon as it finishes
+    """
+    import asyncio
+    
+    tracker = BatchProgressTracker(batch_ids, min_interval, max_interval)
+    
+    async def retrieve(batch_id):
+        if inspect.iscoroutinefunction(client.batches.retrieve):
+            return await client.batches.retrieve(batch_id)
+        return await asyncio.to_thread(client.batches.retrieve, batch_id)
+    
+    while tracker.pending:
+        batch_statuses = await asyncio.gather(*(retrieve(batch_id) for batch_id in tracker.due(time.monotonic())))
+        for batch_status in batch_statuses:
+            finished = tracker.update(batch_status, time.monotonic())
+            print(tracker.describe(batch_status.id, time.monotonic()))
+            if finished:
+                yield batch_status
+        
+        if tracker.pending:
+            await asyncio.sleep(tracker.sleep_time(time.monotonic()))
+
+def monitor_batch_status(client, batch_id: str, min_interval: float = 5, max_interval: float = 120) -> dict:
     """
     Monitors the status of a batch processing job.
     
     Args:
         client: OpenAI client instance
         batch_id: ID of the batch job to monitor
-        interval: Time in seconds between status checks (default: 10)
+        min_interval: Shortest time in seconds between status checks
+        max_interval: Longest time in seconds between status checks
         
     Returns:
         dict: Final batch status
     """
-    while True:
-        batch_status = client.batches.retrieve(batch_id)
-        print("Batch status: {}".format(batch_status.status))
-        print(
-            f"Completed requests: {batch_status.request_counts.completed} / {batch_status.request_counts.total}"
-        )
+    return monitor_batches(client, [batch_id], min_interval, max_interval)[0]
 
-        if batch_status.status.lower() in ["completed", "failed", "canceled"]:
-            break
+def monitor_batches(client, batch_ids: list, min_interval: float = 5, max_interval: float = 120) -> list:
+    """
+    Monitors several batch processing jobs together until all of them have finished.
+    
+    Returns:
+        list: Final batch status of each job, in the order of batch_ids
+    """
+    statuses = {
+        batch_status.id: batch_status
+        for batch_status in iter_finished_batches(client, batch_ids, min_interval, max_interval)
+    }
+    return [statuses[batch_id] for batch_id in batch_ids]
 
-        time.sleep(interval)
+class UploadReader(io.RawIOBase):
+    """
+    Reads a batch input file, or a byte range of it, in chunks for a streamed upload.
+    
+    With compress set, the data is gzip-compressed while it is read, so neither the file
+    nor its compressed form is held in memory. The compressed length is not known in
+    advance, so such an upload is sent with chunked transfer encoding and can only be
+    restarted from the beginning, as the client does before it retries a request.
+    
+    Args:
+        path: File to upload
+        compress: Whether to gzip the data while it is read
+        offset: Start of the byte range to read
+        length: Length of the byte range (None for the rest of the file)
+        progress_step: Fraction of the data between two progress lines (None for no progress)
+    """
     
-    return batch_status
+    def __init__(
+        self,
+        path: Path,
+        compress: bool = False,
+        offset: int = 0,
+        length: int = None,
+        progress_step: float | None = 0.1
+    ):
+        super().__init__()
+        self.path = path
+        self.start = offset
+        self.size = path.stat().st_size - offset if length is None else length
+        self.compress = compress
+        self.progress_step = progress_step
+        self.file = open(path, "rb")
+        self.bytes_sent = 0
+        self.rewind()
+    
+    def rewind(self) -> None:
+        self.file.seek(self.start)
+        # wbits=31 writes a gzip header and trailer around the deflate stream
+        self.compressor = zlib.compressobj(wbits=31) if self.compress else None
+        self.buffer = b""
+        self.reported = 0.0
+    
+    def readable(self) -> bool:
+        return True
+    
+    def tell(self) -> int:
+        if self.compress:
+            raise io.UnsupportedOperation("tell")
+        return self.file.tell() - self.start
+    
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        # httpx seeks to the end and back to size an uncompressed upload
+        if self.compress and (offset, whence) != (0, os.SEEK_SET):
+            raise io.UnsupportedOperation("a compressed upload can only be restarted")
+        position = offset + {os.SEEK_SET: 0, os.SEEK_CUR: self.file.tell() - self.start, os.SEEK_END: self.size}[whence]
+        if position == 0:
+            self.rewind()
+        else:
+            self.file.seek(self.start + position)
+        return position
+    
+    def read(self, size: int = -1) -> bytes:
+        if size is None or size < 0:
+            return b"".join(iter(lambda: self.read(1024 * 1024), b""))
+        remaining = self.start + self.size - self.file.tell()
+        if not self.compress:
+            chunk = self.file.read(max(0, min(size, remaining)))
+        else:
+            while len(self.buffer) < size and self.compressor:
+                data = self.file.read(max(0, min(size, remaining)))
+                remaining -= len(data)
+                if data:
+                    self.buffer += self.compressor.compress(data)
+                else:
+                    self.buffer += self.compressor.flush()
+                    self.compressor = None
+            chunk, self.buffer = self.buffer[:size], self.buffer[size:]
+        self.bytes_sent += len(chunk)
+        self.report()
+        return chunk
+    
+    def report(self) -> None:
+        if self.progress_step is None or self.reported >= 1.0:
+            return
+        done = (self.file.tell() - self.start) / self.size if self.size else 1.0
+        if done >= min(1.0, self.reported + self.progress_step):
+            self.reported = done
+            print(f"Uploading {self.path.name}: {done:.0%} of {self.size / 1024 / 1024:.1f} MB")
+    
+    def close(self) -> None:
+        self.file.close()
+        super().close()
 
-def submit_klusterai_job(client: OpenAI, last_run_file: Path, file_dir: Path) -> str:
-    input_path = file_dir / "batch_input.jsonl"
-    if not input_path.exists():
-        raise FileNotFoundError(f"Input file not found: {input_path}")
-        
-    try:
-        batch_input_file = client.files.create(
-            file=open(input_path, "rb"),
+def upload_batch_file(
+    client: "OpenAI",
+    input_path: Path,
+    compress: bool = False,
+    metrics: RunMetrics = None
+) -> str:
+    """
+    Uploads a batch input file in one streamed request to the Files endpoint.
+    
+    The file is read in chunks while it is sent, and gzip-compressed on the way with
+    compress set. Only enable compression for endpoints that accept gzipped JSONL files.
+    
+    Returns:
+        str: ID of the uploaded file
+    """
+    metrics = metrics or RunMetrics()
+    name = input_path.name + (".gz" if compress else "")
+    with UploadReader(input_path, compress) as reader:
+        uploaded = client.files.create(
+            file=(name, reader, "application/gzip" if compress else "application/jsonl"),
             purpose="batch"
         )
+        metrics.count("upload", requests=1, bytes_sent=reader.bytes_sent)
+    return uploaded.id
+
+def upload_batch_file_parts(
+    client: "OpenAI",
+    input_path: Path,
+    part_mb: float = 64,
+    rate_limit: dict = None,
+    metrics: RunMetrics = None
+) -> str:
+    """
+    Uploads a batch input file in parts through the Uploads API.
+    
+    Each part is streamed from its offset in the file. A part that fails is retried on
+    its own with jittered exponential backoff, so a failure part way through does not
+    send the whole file again. If a part still fails, the upload is cancelled.
+    
+    Args:
+        client: OpenAI client instance
+        input_path: File to upload
+        part_mb: Size of each part in MB (the Uploads API accepts up to 64 MB)
+        rate_limit: Retry settings (processing.rate_limit)
+        metrics: Optional run metrics, parts and retries are counted in the upload stage
+        
+    Returns:
+        str: ID of the uploaded file
+    """
+    from openai import APIConnectionError, InternalServerError, RateLimitError
+    
+    rate_limit = {'max_retries': 5, 'backoff_seconds': 1, 'max_backoff_seconds': 60, **(rate_limit or {})}
+    metrics = metrics or RunMetrics()
+    size = input_path.stat().st_size
+    upload = client.uploads.create(
+        bytes=size,
+        filename=input_path.name,
+        mime_type="application/jsonl",
+        purpose="batch"
+    )
+    part_size = int(part_mb * 1024 * 1024)
+    part_ids = []
+    try:
+        for offset in range(0, size, part_size):
+            for attempt in itertools.count():
+                with UploadReader(input_path, offset=offset, length=min(part_size, size - offset), progress_step=None) as part_reader:
+                    try:
+                        part = client.uploads.parts.create(upload.id, data=(input_path.name, part_reader))
+                        break
+                    except (APIConnectionError, InternalServerError, RateLimitError) as e:
+                        if attempt >= rate_limit['max_retries']:
+                            raise
+                        metrics.count("upload", retries=1)
+                        delay = random.uniform(0, min(rate_limit['max_backoff_seconds'], rate_limit['backoff_seconds'] * 2 ** attempt))
+                        print(f"Retrying part {len(part_ids) + 1} of {input_path.name} in {delay:.1f}s: {e}")
+                        time.sleep(delay)
+                    finally:
+                        metrics.count("upload", requests=1, bytes_sent=part_reader.bytes_sent)
+            part_ids.append(part.id)
+            done = min(size, offset + part_size) / size
+            print(f"Uploading {input_path.name}: part {len(part_ids)}, {done:.0%} of {size / 1024 / 1024:.1f} MB")
+    except BaseException:
+        try:
+            client.uploads.cancel(upload.id)
+        except Exception as e:
+            print(f"Error cancelling upload {upload.id}: {e}")
+        raise
+    
+    return client.uploads.complete(upload.id, part_ids=part_ids).file.id
+
+def submit_batch_shard(
+    client: "OpenAI",
+    input_path: Path,
+    upload_part_mb: float = 0,
+    upload_gzip: bool = False,
+    rate_limit: dict = None,
+    metrics: RunMetrics = None
+) -> str:
+    """
+    Uploads one batch input file and creates its batch job.
+    
+    With upload_part_mb set, the file is uploaded in parts of that size, see
+    upload_batch_file_parts. Otherwise it is streamed in one request, see upload_batch_file.
+    upload_gzip only applies to the latter.
+    
+    Returns:
+        str: Batch ID
+    """
+    try:
+        if upload_part_mb:
+            input_file_id = upload_batch_file_parts(client, input_path, upload_part_mb, rate_limit, metrics)
+        else:
+            input_file_id = upload_batch_file(client, input_path, upload_gzip, metrics)
     except Exception as e:
-        print(f"Error uploading batch file: {e}")
+        print(f"Error uploading batch file {input_path}: {e}")
         raise
 
     # Create batch request
     response = client.batches.create(
-        input_file_id=batch_input_file.id,
+        input_file_id=input_file_id,
         endpoint="/v1/chat/completions",
         completion_window="24h",
     )
-    print(f"Batch request submitted. Batch ID: {response.id}")
-
-    update_last_run_time(last_run_file)
+    print(f"Batch request submitted for {input_path.name}. Batch ID: {response.id}")
     return response.id
 
-def retrieve_result_file_contents(batch_status, client, file_dir: Path) -> Path:
+def submit_klusterai_job(
+    client: "OpenAI",
+    file_dir: Path,
+    max_workers: int = 4,
+    journal: RunJournal = None,
+    metrics: RunMetrics = None,
+    upload_part_mb: float = 0,
+    upload_gzip: bool = False,
+    rate_limit: dict = None
+) -> list:
+    """
+    Uploads every batch input shard of a run and creates their batch jobs concurrently.
+    
+    With a journal, each batch ID is recorded as soon as its job is created and shards
+    that already have a job from an interrupted attempt are not submitted again. With
+    metrics, the upload requests and bytes sent are counted in the upload stage. See
+    submit_batch_shard for the upload settings.
+    
+    Returns:
+        list: Batch IDs, in shard order
+    """
+    shard_paths = list_input_shards(file_dir)
+    if not shard_paths:
+        raise FileNotFoundError(f"No batch input files found in {file_dir}")
+    
+    batch_ids = journal.submitted() if journal else {}
+    
+    def submit(shard: int) -> None:
+        batch_ids[shard] = submit_batch_shard(
+            client, shard_paths[shard], upload_part_mb, upload_gzip, rate_limit, metrics
+        )
+        if journal:
+            journal.record("submitted", shard=shard, batch_id=batch_ids[shard])
+    
+    pending = [shard for shard in range(len(shard_paths)) if shard not in batch_ids]
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        list(executor.map(submit, pending))
+
+    return [batch_ids[shard] for shard in range(len(shard_paths))]
+
+def retrieve_result_file_contents(
+    batch_status,
+    client,
+    file_dir: Path,
+    chunk_size: int = 1024 * 1024,
+    result_name: str = "batch_results.jsonl",
+    file_id: str | None = None
+) -> Path:
     """
     Saves the results of a completed batch job to a local file.
+    
+    The result file is streamed to disk in chunks instead of being loaded into memory.
+    file_id selects another file of the job, such as its error file, instead of its output.
     """
-    result_file_id = batch_status.output_file_id
-    results = client.files.content(result_file_id).content
+    result_file_id = file_id or batch_status.output_file_id
+    result_path = file_dir / result_name
     
-    result_path = file_dir / "batch_results.jsonl"
+    with client.files.with_streaming_response.content(result_file_id) as response:
+        with open(result_path, "wb") as file:
+            for chunk in response.iter_bytes(chunk_size):
+                file.write(chunk)
+    print(f"\nResults saved to {result_path}")
+    return result_path
+
+def update_result_file(batch_status, client, result_path: Path, saved: int, chunk_size: int = 1024 * 1024) -> int:
+    """
+    Downloads a job's output file again into result_path, whose first saved bytes hold
+    an earlier download.
+    
+    Output files grow while a job runs, so the earlier bytes are compared with the download
+    instead of being written again, and only the rest of the file is written.
     
-    with open(result_path, "wb") as file:
-        file.write(results)
+    Returns:
+        int: Offset from which the file has changed, saved unless the output was rewritten
+        rather than appended to, in which case it is 0
+    """
+    start = saved if result_path.exists() else 0
+    position = 0
+    with client.files.with_streaming_response.content(batch_status.output_file_id) as response:
+        with open(result_path, "r+b" if start else "wb") as file:
+            for chunk in response.iter_bytes(chunk_size):
+                if position < start:
+                    head = chunk[:start - position]
+                    if file.read(len(head)) == head:
+                        position += len(head)
+                        chunk = chunk[len(head):]
+                    else:
+                        # Everything before position is unchanged, the file is rewritten from there
+                        start = 0
+                        file.seek(position)
+                file.write(chunk)
+                position += len(chunk)
+            file.truncate()
     print(f"\nResults saved to {result_path}")
+    return start if position >= start else 0
+
+def merge_shard_results(file_dir: Path, shard_result_paths: list) -> Path:
+    """
+    Merges per-shard result files into batch_results.jsonl in custom_id order.
+    
+    Shards cover consecutive custom_id ranges, so sorting each shard on its own and
+    concatenating them in shard order sorts the whole output. Only the index and byte
+    range of each line are sorted, the lines are then copied over one at a time, so
+    memory does not grow with the size of the results. A shard whose requests all
+    failed completes without an output file and is skipped.
+    """
+    result_path = file_dir / "batch_results.jsonl"
+    with open(result_path, "wb") as output_file:
+        for shard_path in shard_result_paths:
+            if not Path(shard_path).exists():
+                print(f"No results for {Path(shard_path).name}, skipping it")
+                continue
+            with open(shard_path, "rb") as shard_file:
+                lines = []
+                offset = 0
+                for line in shard_file:
+                    if line.strip():
+                        lines.append((custom_id_index(json.loads(line).get("custom_id", "")), offset, len(line)))
+                    offset += len(line)
+                lines.sort()
+                for _, offset, length in lines:
+                    shard_file.seek(offset)
+                    line = shard_file.read(length)
+                    output_file.write(line if line.endswith(b"\n") else line + b"\n")
+    return result_path
+
+def iter_message_chunks(text: str, limit: int = 35000):
+    """
+    Lazily splits a message into chunks of specified size limit, preferably at newlines.
+    
+    The text is scanned by offset: each chunk is sliced once and the search for its
+    last newline is bounded by the limit, so splitting takes linear time in the length
+    of the text.
+    
+    Yields:
+        str: Message chunks, whitespace between chunks is dropped
+    """
+    start, end = 0, len(text)
+    while start < end:
+        if end - start <= limit:
+            yield text[start:]
+            return
+        
+        # Find the last newline within the limit
+        split_index = text.rfind('\n', start, start + limit)
+        if split_index == -1:  # No newline found, just split at limit
+            split_index = start + limit
+        
+        if split_index > start:
+            yield text[start:split_index]
+        start = split_index
+        while start < end and text[start].isspace():
+            start += 1
 
 def chunk_message(text: str, limit: int = 35000) -> list:
     """
@@ -514,23 +2640,37 @@ def chunk_message(text: str, limit: int = 35000) -> list:
     Returns:
         list: List of message chunks
     """
-    chunks = []
-    while text:
-        if len(text) <= limit:
-            chunks.append(text)
-            break
-        
-        # Find the last newline within the limit
-        split_index = text[:limit].rfind('\n')
-        if split_index == -1:  # No newline found, just split at limit
-            split_index = limit
-            
-        chunks.append(text[:split_index])
-        text = text[split_index:].lstrip()
+    return list(iter_message_chunks(text, limit))
+
+def create_slack_session(slack_token: str, pool_size: int = 4, rate_limit: dict = None) -> requests.Session:
+    """
+    Creates a Slack API session that reuses pooled keep-alive connections.
     
-    return chunks
+    Requests go through a RateLimitAdapter, so a 429 answer holds back every thread for
+    the Retry-After time Slack asks for and is then retried. Posts are not retried after
+    other errors, as that could post a message twice.
+    """
+    session = requests.Session()
+    session.headers.update({
+        "Content-Type": "application/json",
+        "Authorization": f"Bearer {slack_token}"
+    })
+    adapter = RateLimitAdapter(**{
+        **(rate_limit or {}), "retry_posts": False, "pool_connections": pool_size, "pool_maxsize": pool_size
+    })
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
 
-def post_to_slack(channel: str, text: str, token: str, debug: bool = False):
+def post_to_slack(
+    channel: str,
+    text: str,
+    token: str,
+    debug: bool = False,
+    session: requests.Session = None,
+    base_url: str = SLACK_API_URL,
+    thread_ts: str = None
+) -> str | None:
     """
     Posts a message to a Slack channel, breaking into multiple messages if needed.
     
@@ -539,145 +2679,421 @@ def post_to_slack(channel: str, text: str, token: str, debug: bool = False):
         text: Message text to post
         token: Slack API token
         debug: If True, print messages instead of posting to Slack
+        session: Optional Slack API session to reuse
+        base_url: Slack Web API URL
+        thread_ts: Optional timestamp of a message to reply to in its thread
+        
+    Returns:
+        str | None: Timestamp of the first posted message, or None if posting failed
         
     Raises:
         Prints error message if posting fails (e.g., bot not in channel)
     """
     if debug:
         print("\n=== DEBUG: would post to Slack ===")
-        print(f"Channel: {channel}")
+        print(f"Channel: {channel}" + (f" (thread {thread_ts})" if thread_ts else ""))
         print("Message content:")
         print(text)
         print("===================================\n")
-        return
+        return "debug"
 
-    slack_url = "https://slack.com/api/chat.postMessage"
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {token}"
-    }
+    session = session or create_slack_session(token)
+    first_ts = None
     
     # Split message into chunks if needed
-    chunks = chunk_message(text)
-    
-    for chunk in chunks:
+    for chunk in iter_message_chunks(text):
         data = {
             "channel": channel,
             "text": chunk,
             "unfurl_links": False,
             "unfurl_media": False
         }
-        response = requests.post(slack_url, headers=headers, json=data)
-        response_data = response.json()
+        if thread_ts:
+            data["thread_ts"] = thread_ts
+        response = session.post(f"{base_url}/chat.postMessage", json=data)
+        try:
+            response_data = response.json()
+        except ValueError:
+            response_data = {"error": f"HTTP {response.status_code}"}
         
         if not response_data.get("ok"):
             error = response_data.get("error", "Unknown error")
             print(f"Failed to send message to Slack: {error}")
             if error == "not_in_channel":
                 print("The bot is not in the channel. Please invite the bot to the channel.")
-            break  # Stop sending chunks if there's an error
+            return None  # Stop sending chunks if there's an error
+        first_ts = first_ts or response_data.get("ts")
+    
+    return first_ts
+
+def pack_fragments(fragments, limit: int = 35000):
+    """
+    Packs message fragments, such as single summaries, into as few messages as possible
+    without splitting a fragment across messages. Only fragments longer than the limit
+    on their own are split, with iter_message_chunks. Fragments can come from any
+    iterator, so the full report never has to be built as one string.
+    
+    Yields:
+        str: Messages of at most limit characters
+    """
+    parts = []
+    size = 0
+    for fragment in fragments:
+        if parts and size + len(fragment) > limit:
+            yield "".join(parts)
+            parts, size = [], 0
+        if len(fragment) > limit:
+            yield from iter_message_chunks(fragment, limit)
+            continue
+        parts.append(fragment)
+        size += len(fragment)
+    if parts:
+        yield "".join(parts)
+
+class SlackReporter:
+    """
+    Delivers the report to a Slack channel over one pooled, rate-limit-aware session.
+    
+    Messages are packed on summary boundaries and sent back to back, only slowed down
+    when Slack answers with a Retry-After. In thread mode every repository gets a
+    top-level message with its summaries as replies in its thread. The top-level
+    messages are posted in report order, then the threads of all repositories are
+    filled concurrently.
+    
+    With a run journal, posted chunks and repository sections are recorded and not
+    posted again when an interrupted run is resumed. In thread mode the timestamp of
+    every top-level message and each reply in its thread are recorded as well, so a
+    resumed run finishes a half-filled thread instead of starting a new one.
+    """
+    
+    def __init__(
+        self,
+        channel: str,
+        token: str,
+        base_url: str = SLACK_API_URL,
+        debug: bool = False,
+        threads: bool = False,
+        max_workers: int = 4,
+        rate_limit: dict = None,
+        journal: RunJournal = None
+    ):
+        self.channel = channel
+        self.token = token
+        self.base_url = base_url
+        self.debug = debug
+        self.threads = threads
+        self.max_workers = max_workers
+        self.journal = journal
+        self.session = None if debug else create_slack_session(token, max_workers, rate_limit)
+    
+    def post(self, text: str, thread_ts: str = None) -> str | None:
+        return post_to_slack(self.channel, text, self.token, self.debug, self.session, self.base_url, thread_ts)
+    
+    def record(self, **data) -> None:
+        if self.journal:
+            self.journal.record("posted", **data)
+    
+    def post_parent(self, repo_name: str, summaries: list) -> str | None:
+        """
+        Posts a repository's top-level message, or returns the one a resumed run already posted.
+        """
+        parent_ts = self.journal.thread_parents().get(repo_name) if self.journal else None
+        if parent_ts is None:
+            parent_ts = self.post(f"*Repository: {repo_name}* ({len(summaries)} updates)")
+            if parent_ts is not None:
+                self.record(parent=repo_name, ts=parent_ts)
+        return parent_ts
+    
+    def post_thread(self, repo_name: str, summaries: list, parent_ts: str = None) -> bool:
+        """
+        Posts a repository's summaries as replies to its top-level message.
+        """
+        parent_ts = parent_ts or self.post_parent(repo_name, summaries)
+        if parent_ts is None:
+            return False
+        replied = self.journal.thread_replies(repo_name) if self.journal else set()
+        for index, chunk in enumerate(pack_fragments(summaries)):
+            if index in replied:
+                continue
+            if self.post(chunk, parent_ts) is None:
+                return False
+            self.record(thread=repo_name, reply=index)
+        self.record(section=repo_name)
+        return True
+    
+    def post_section(self, repo_name: str, summaries: list, header: str = None) -> bool:
+        """
+        Posts one repository's section, preceded by the report header if given.
+        """
+        if self.threads:
+            if header:
+                if self.post(header) is None:
+                    return False
+                self.record(header=True)
+            return self.post_thread(repo_name, summaries)
+        
+        fragments = ([header] if header else []) + repo_section_fragments(repo_name, summaries)
+        for chunk in pack_fragments(fragments):
+            if self.post(chunk) is None:
+                return False
+        self.record(section=repo_name)
+        return True
+    
+    def post_report(self, header: str, repo_results: dict) -> bool:
+        """
+        Posts the whole report, repo_results maps each repository to its summaries.
+        """
+        if not self.threads:
+            fragments = itertools.chain([header], itertools.chain.from_iterable(
+                repo_section_fragments(repo_name, summaries)
+                for repo_name, summaries in repo_results.items()
+            ))
+            posted = self.journal.posted("chunk") if self.journal else set()
+            for index, chunk in enumerate(pack_fragments(fragments)):
+                if index in posted:
+                    continue
+                if self.post(chunk) is None:
+                    return False
+                self.record(chunk=index)
+            return True
+        
+        posted = self.journal.posted("section") if self.journal else set()
+        if not (self.journal and self.journal.posted("header")):
+            if self.post(header) is None:
+                return False
+            self.record(header=True)
         
-        # Add a small delay between chunks to avoid rate limiting
-        if len(chunks) > 1:
-            time.sleep(10)
+        # Top-level messages keep the report order, the threads below them do not depend on each other
+        parents = {}
+        for repo_name, summaries in repo_results.items():
+            if repo_name in posted:
+                continue
+            parents[repo_name] = self.post_parent(repo_name, summaries)
+            if parents[repo_name] is None:
+                return False
+        
+        with ThreadPoolExecutor(max_workers=max(1, self.max_workers)) as executor:
+            return all(executor.map(
+                lambda repo_name: self.post_thread(repo_name, repo_results[repo_name], parents[repo_name]),
+                parents
+            ))
+
+def custom_id_index(custom_id: str) -> int:
+    """
+    Returns the issue number encoded in an "issue-<n>" custom_id, for sorting.
+    """
+    try:
+        return int(custom_id.rsplit("-", 1)[-1])
+    except ValueError:
+        return 0
+
+def load_issue_metadata(file_dir: Path) -> dict:
+    """
+    Maps each custom_id of a run to the URL, title and repository of its issue.
+    """
+    issue_metadata = {}
+    for entry in iter_jsonl(file_dir / "batch_metadata.jsonl"):
+        metadata = entry.get("metadata", {})
+        issue_metadata[entry.get("custom_id", "N/A")] = (
+            metadata.get("issue_url", "No URL available"),
+            metadata.get("title", ""),
+            metadata.get("repo_name", "unknown")
+        )
+    return issue_metadata
+
+def format_summary(issue_metadata: dict, custom_id: str, response: dict) -> Tuple[str, str]:
+    """
+    Formats one result as a Slack summary entry.
+    
+    Returns:
+        Tuple[str, str]: Repository name and formatted summary
+    """
+    response_content = response.get("body", {}).get("choices", [{}])[0].get("message", {}).get("content", "No content available")
+    issue_url, title, repo_name = issue_metadata.get(custom_id, ("No URL available", "No title available", "unknown"))
+    return repo_name, f"*Title:* <{issue_url}|[{title}]>\n{response_content}\n──────────────────────────────────────\n\n"
+
+def format_report_header(org_name: str, run_started: float = None) -> str:
+    # Dated by the start of the run, so a resumed run posts the same header as the original
+    today_date = (datetime.fromtimestamp(run_started) if run_started is not None else datetime.now()).strftime("%B %d, %Y")
+    return f"*Latest Updates for {org_name} ({today_date})*\n\n"
+
+def repo_section_fragments(repo_name: str, summaries: list) -> list:
+    return [
+        f"*Repository: {repo_name}*\n",
+        *summaries,
+        "━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
+    ]
 
 def process_and_post_results(
     org_name: str,
-    slack_channel: str,
-    slack_token: str,
+    slack: SlackReporter,
     file_dir: Path,
-    debug: bool = False
+    run_started: float = None
 ) -> None:
     """
     Processes batch results and posts them to Slack.
     
     Args:
         org_name: GitHub organization name
-        slack_channel: Slack channel to post to
-        slack_token: Slack API token
+        slack: Slack reporter to deliver the report with
         file_dir: Directory containing the input and output files
-        debug: If True, print messages instead of posting to Slack
+        run_started: Start time of the run, dates the report header
     """
-    input_path = file_dir / "batch_input.jsonl"
-    output_path = file_dir / "batch_results.jsonl"
-    
-    today_date = datetime.now().strftime("%B %d, %Y")
-    issue_url_map = {}
-    repo_results = {}
-    
-    # Create issue URL map
-    with open(input_path, "r") as input_file:
-        for line in input_file:
-            task = json.loads(line)
-            custom_id = task.get("custom_id", "N/A")
-            metadata = task.get("metadata", {})
-            issue_url_map[custom_id] = (
-                metadata.get("issue_url", "No URL available"),
-                metadata.get("title", ""),
-                metadata.get("repo_name", "unknown")
-            )
-    
-    # Process results and organize by repository
-    with open(output_path, "r") as output_file:
-        for line in output_file:
-            result = json.loads(line)
-            custom_id = result.get("custom_id", "N/A")
-            response_content = result.get("response", {}).get("body", {}).get("choices", [{}])[0].get("message", {}).get("content", "No content available")
-            issue_url, title, repo_name = issue_url_map.get(custom_id, ("No URL available", "No title available", "unknown"))
-            
-            if repo_name not in repo_results:
-                repo_results[repo_name] = []
-            
-            repo_results[repo_name].append(f"*Title:* <{issue_url}|[{title}]>\n{response_content}\n──────────────────────────────────────\n\n")
-    
-    # Create combined message grouped by repository
-    combined_message = f"*Latest Updates for {org_name} ({today_date})*\n\n"
-    
-    for repo_name, summaries in repo_results.items():
-        combined_message += f"*Repository: {repo_name}*\n"
-        combined_message += "".join(summaries)
-        combined_message += "━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
-    
-    # Split into chunks if necessary and post
-    chunks = chunk_message(combined_message)
-    for chunk in chunks:
-        post_to_slack(slack_channel, chunk, slack_token, debug=debug)
+    issue_metadata = load_issue_metadata(file_dir)
+    indexed_results = {}
+    
+    # Organize results by repository, in issue order. Each result is reduced to its summary
+    # text as it is read, so only the summaries are held while they are sorted.
+    for custom_id, response in fan_out_results(iter_batch_results(file_dir), load_duplicates(file_dir)):
+        repo_name, summary = format_summary(issue_metadata, custom_id, response)
+        indexed_results.setdefault(repo_name, []).append((custom_id_index(custom_id), summary))
+    repo_results = {
+        repo_name: [summary for _, summary in sorted(summaries, key=lambda entry: entry[0])]
+        for repo_name, summaries in sorted(indexed_results.items(), key=lambda item: min(index for index, _ in item[1]))
+    }
     
-    if debug:
+    if not slack.post_report(format_report_header(org_name, run_started), repo_results):
+        print("Posting to Slack stopped after an error")
+    elif slack.debug:
         print("Debug mode: Skipped posting to Slack")
     else:
-        print(f"Updates posted to Slack channel {slack_channel}")
+        print(f"Updates posted to Slack channel {slack.channel}")
 
-def process_issue_content(issue: dict, max_input_tokens_per_request: int, headers: dict) -> dict:
+class IncrementalReport:
     """
-    Processes an issue's content to fit within token limits, including fetching comments if space allows.
+    Posts the Slack report one repository at a time while batch results come in.
+    
+    A repository's section is posted as soon as the summaries of all of its issues have
+    arrived, so repositories whose requests finish early reach Slack before the slowest
+    request of the run. finish() posts whatever is left, e.g. after a failed shard.
+    Sections that a run journal records as posted are not posted again. Each result is
+    also added for the requests that were deduplicated into it.
+    """
+    
+    def __init__(self, org_name: str, slack: SlackReporter, file_dir: Path, run_started: float = None):
+        self.org_name = org_name
+        self.run_started = run_started
+        self.slack = slack
+        self.issue_metadata = load_issue_metadata(file_dir)
+        self.duplicates = load_duplicates(file_dir)
+        self.outstanding = {}
+        self.summaries = {}
+        self.posted = slack.journal.posted("section") if slack.journal else set()
+        self.header_posted = bool(self.posted or (slack.journal and slack.journal.posted("header")))
+        for custom_id, (_, _, repo_name) in self.issue_metadata.items():
+            self.outstanding.setdefault(repo_name, set()).add(custom_id)
+    
+    def add(self, custom_id: str, response: dict) -> None:
+        for custom_id, response in fan_out_results([(custom_id, response)], self.duplicates):
+            self.add_result(custom_id, response)
+    
+    def add_result(self, custom_id: str, response: dict) -> None:
+        repo_name, summary = format_summary(self.issue_metadata, custom_id, response)
+        if repo_name in self.posted:
+            return
+        self.summaries.setdefault(repo_name, []).append((custom_id_index(custom_id), summary))
+        outstanding = self.outstanding.setdefault(repo_name, set())
+        outstanding.discard(custom_id)
+        if not outstanding:
+            self.post_section(repo_name)
+    
+    def post_section(self, repo_name: str) -> None:
+        summaries = [summary for _, summary in sorted(self.summaries.pop(repo_name), key=lambda entry: entry[0])]
+        header = None if self.header_posted else format_report_header(self.org_name, self.run_started)
+        self.header_posted = True
+        self.posted.add(repo_name)
+        if self.slack.post_section(repo_name, summaries, header):
+            print(f"Posted {len(summaries)} summaries for {repo_name}")
+    
+    def finish(self) -> None:
+        for repo_name in list(self.summaries):
+            self.post_section(repo_name)
+        
+        if not self.header_posted:
+            return
+        if self.slack.debug:
+            print("Debug mode: Skipped posting to Slack")
+        else:
+            print(f"Updates posted to Slack channel {self.slack.channel}")
+
+def fit_issue_body(issue: dict, max_input_tokens_per_request: int, truncation_mode: str = "head") -> int:
+    """
+    Truncates an issue's body to fit exactly within the token limit.
     
     Args:
-        issue: Dictionary containing issue data
+        issue: Dictionary containing issue data, updated in place
         max_input_tokens_per_request: Maximum number of requested input tokens per request
-        headers: Request headers for GitHub API
+        truncation_mode: "head" or "head_tail", see truncate_to_tokens
         
     Returns:
-        dict: Updated issue with processed content including comments 
+        int: Tokens left for comments, 0 if the body had to be truncated
     """
-    base_content = f"Repository: {issue['repository_name']}\nTitle: {issue['title']}\nBody: {issue['body']}"
-    base_tokens = calculate_tokens(base_content)
+    prefix = f"Repository: {issue['repository_name']}\nTitle: {issue['title']}\nBody: "
+    base_tokens = calculate_tokens(f"{prefix}{issue['body']}")
     
     if base_tokens > max_input_tokens_per_request:
         print(f"Issue {issue['number']} exceeds token limit. Truncating body.")
-        excess_tokens = base_tokens - max_input_tokens_per_request
-        chars_to_remove = excess_tokens * 4
-        issue['body'] = issue['body'][:-chars_to_remove]
-    else:
-        remaining_tokens = max_input_tokens_per_request - base_tokens
-        if issue.get("comments", 0) > 0 and remaining_tokens > 0:
-            issue['comments_text'] = fetch_issue_comments(
-                issue.get("comments_url", ""),
-                headers,
-                remaining_tokens
-            )
+        body = issue['body'] or ""
+        body_budget = max_input_tokens_per_request - calculate_tokens(prefix)
+        while True:
+            issue['body'] = truncate_to_tokens(body, body_budget, truncation_mode)
+            # The body's first word can merge with the prefix's trailing space
+            overshoot = calculate_tokens(prefix + issue['body']) - max_input_tokens_per_request
+            if overshoot <= 0 or not issue['body']:
+                return 0
+            body_budget -= overshoot
+    
+    return max_input_tokens_per_request - base_tokens
+
+def process_issues_content(
+    issues: list,
+    max_input_tokens_per_request: int,
+    session: requests.Session,
+    max_workers: int = 8,
+    truncation_mode: str = "head"
+) -> list:
+    """
+    Processes every issue's content, fetching comments for all issues concurrently.
     
-    return issue
+    Comment requests are submitted to a bounded worker pool while the issue bodies are
+    being sized, and each thread is token-budgeted as soon as its comments arrive.
+    Comments already fetched by the GraphQL backend are budgeted without a request.
+    Issues are updated in place, so the output order matches the input order. The
+    tokens of each issue's body and comments, as counted while fitting them, are kept
+    as its input_tokens.
+    
+    Args:
+        issues: List of issue dictionaries
+        max_input_tokens_per_request: Maximum number of requested input tokens per request
+        session: GitHub API session including authentication
+        max_workers: Maximum number of concurrent comment requests
+        truncation_mode: "head" or "head_tail", see truncate_to_tokens
+        
+    Returns:
+        list: The processed issues, in their original order
+    """
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        pending = {}
+        for i, issue in enumerate(issues):
+            print(f"Processing issue {i+1}/{len(issues)}: {issue.get('title', 'No title')[:60]}...")
+            remaining_tokens = fit_issue_body(issue, max_input_tokens_per_request, truncation_mode)
+            issue['input_tokens'] = max_input_tokens_per_request - remaining_tokens
+            prefetched_comments = issue.pop("prefetched_comments", None)
+            if issue.get("comments", 0) > 0 and remaining_tokens > 0:
+                if prefetched_comments is not None:
+                    issue['comments_text'], comment_tokens = join_comments_counted(prefetched_comments, remaining_tokens)
+                    issue['input_tokens'] += comment_tokens
+                    continue
+                future = executor.submit(get_issue_comments, issue.get("comments_url", ""), session)
+                pending[future] = (i, remaining_tokens)
+        
+        for done, future in enumerate(as_completed(pending), 1):
+            i, remaining_tokens = pending[future]
+            issues[i]['comments_text'], comment_tokens = join_comments_counted(future.result(), remaining_tokens)
+            issues[i]['input_tokens'] += comment_tokens
+            print(f"Fetched comments {done}/{len(pending)}: {issues[i].get('title', 'No title')[:60]}...")
+    
+    return issues
 
 def main():
     print("\n=== GitHub Issue/PR Summarizer Starting ===")
@@ -685,8 +3101,17 @@ def main():
     parser.add_argument('--config', default='config.yaml',
                        help='Path to the YAML configuration file')
     parser.add_argument('--env', help='Path to the environment file (optional)')
+    parser.add_argument('--warm-tokenizer-cache', metavar='DIR', nargs='?', const='',
+                       help='Download the tokenizer files into DIR (default: TIKTOKEN_CACHE_DIR) and exit')
+    parser.add_argument('--show-result', nargs=2, metavar=('RUN', 'CUSTOM_ID'),
+                       help='Print the stored metadata and result of one request of a completed run and exit')
     args = parser.parse_args()
     
+    if args.warm_tokenizer_cache is not None:
+        setup_tokenizer(args.warm_tokenizer_cache)
+        print(f"Tokenizer cache ready in {os.environ.get('TIKTOKEN_CACHE_DIR', 'the default tiktoken directory')}")
+        return
+    
     try:
         config = load_config(args.config, args.env)
         print(f"\nConfiguration loaded successfully")
@@ -697,81 +3122,292 @@ def main():
         print(f"Configuration error: {e}")
         return
     
-    # Create last_run file path from config path
-    last_run_file = Path(args.config).with_suffix('.last_run')
-    
-    # Fetch issues first
-    print(f"\nFetching GitHub issues/PRs since last run...")
-    issues = fetch_github_issues(
-        github_token=config['api']['github']['token'],
-        owner=config['api']['github']['owner'],
-        repo=config['api']['github']['repo'],
-        last_run_file=last_run_file,
-        config=config
-    )
-    
-    if len(issues) == 0:
-        print("No new updates to report")
+    if args.show_result:
+        store = ArtifactStore(config['processing']['batch']['generated_files_directory'])
+        metadata, result = store.lookup(*args.show_result)
+        store.close()
+        if metadata is None and result is None:
+            print(f"No archived entry for {args.show_result[1]} in run {args.show_result[0]}")
+        else:
+            print(json.dumps({"metadata": metadata, "result": result}, indent=2, ensure_ascii=False))
         return
     
-    print(f"Found {len(issues)} issues/PRs to process")
-    
-    # Before processing content
-    print("\nProcessing issue/PR content and comments...")
-    headers = {"Authorization": f"token {config['api']['github']['token']}"}
-   
-    for i in range(len(issues)):
-        print(f"Processing issue {i+1}/{len(issues)}: {issues[i].get('title', 'No title')[:60]}...")
-        issues[i] = process_issue_content(
-            issues[i], 
-            config['processing']['limits']['max_input_tokens_per_request'], 
-            headers
-        )
+    if config['processing']['tokenizer']['cache_dir']:
+        os.environ["TIKTOKEN_CACHE_DIR"] = str(config['processing']['tokenizer']['cache_dir'])
     
-    # Before preparing job
-    print("\nPreparing kluster.ai batch job...")
-    file_dir = prepare_klusterai_job(
-        model=config['api']['klusterai']['model'],
-        requests=issues,
-        batch_dir=config['processing']['batch']['generated_files_directory']
-    )
-    
-    # Before submitting job
-    print("\nSubmitting batch job to kluster.ai...")
-    client = OpenAI(
-        api_key=config['api']['klusterai']['key'],
-        base_url=config['api']['klusterai']['base_url']
-    )
-    
-    batch_id = submit_klusterai_job(
-        client=client,
-        last_run_file=last_run_file,
-        file_dir=file_dir
+    metrics = RunMetrics()
+    try:
+        run_summarizer(config, args.config, metrics)
+        if metrics.status == "running":
+            metrics.status = "completed"
+    except BaseException:
+        metrics.status = "failed"
+        raise
+    finally:
+        metrics_config = config['processing']['metrics']
+        if metrics_config['enabled']:
+            print(f"\n{metrics.describe()}")
+            try:
+                metrics.write_json(Path(args.config).with_suffix('.metrics.jsonl'))
+                if metrics_config['prometheus_textfile']:
+                    metrics.write_prometheus(Path(metrics_config['prometheus_textfile']))
+            except OSError as e:
+                print(f"Error writing run metrics: {e}")
+
+def run_summarizer(config: dict, config_path: str, metrics: RunMetrics) -> None:
+    """
+    Runs the pipeline for a loaded configuration, resuming an interrupted run if there is one.
+    """
+    # Create last_run file and watermark store paths from config path
+    last_run_file = Path(config_path).with_suffix('.last_run')
+    watermarks = None
+    if config['processing']['history']['use_watermarks']:
+        watermarks = WatermarkStore(Path(config_path).with_suffix('.watermarks.db'))
+    
+    http_cache_config = config['processing']['http_cache']
+    cache_config = config['processing']['cache']
+    cache_dir = Path(cache_config['directory']) if cache_config['enabled'] else None
+    batch_dir = config['processing']['batch']['generated_files_directory']
+    
+    # Pick up an interrupted run of this configuration where it stopped instead of starting a new one
+    config_id = hashlib.sha256(str(Path(config_path).resolve()).encode()).hexdigest()[:16]
+    store = ArtifactStore(batch_dir)
+    journal = find_incomplete_run(batch_dir, store, config_id)
+    file_dir = journal.path.parent if journal else None
+    if file_dir:
+        attempts = len(journal.find("resumed"))
+        abandon = None
+        if not journal.has("fetched"):
+            # Stopped before everything fetched was written, there is nothing to resume
+            abandon = "it stopped before its issues were saved"
+        elif attempts >= config['processing']['batch']['max_resume_attempts']:
+            # A run that fails on every resume would block all later runs, start over instead
+            abandon = f"after {attempts} failed resume attempts"
+        if abandon:
+            print(f"\nAbandoning interrupted run in {file_dir}, {abandon}")
+            journal.record("completed", abandoned=True)
+            journal.close()
+            store.complete(file_dir)
+            file_dir = None
+        else:
+            journal.record("resumed", attempt=attempts + 1)
+            print(f"\nResuming interrupted run in {file_dir}")
+    if not file_dir:
+        run_started = time.time()
+        
+        # Fetch issues first
+        print(f"\nFetching GitHub issues/PRs since last run...")
+        github_session = create_github_session(
+            config['api']['github']['token'],
+            config['processing']['concurrency']['github_workers'],
+            Path(http_cache_config['directory']) if http_cache_config['enabled'] else None,
+            config['processing']['rate_limit']
+        )
+        issues = fetch_github_issues(
+            github_token=config['api']['github']['token'],
+            owner=config['api']['github']['owner'],
+            repo=config['api']['github']['repo'],
+            last_run_file=last_run_file,
+            config=config,
+            session=github_session,
+            watermarks=watermarks,
+            metrics=metrics
+        )
+        
+        if len(issues) == 0:
+            # Nothing to summarize, the fetched windows are done
+            if watermarks:
+                watermarks.commit()
+                watermarks.close()
+            store.close()
+            log_http_cache_stats(github_session, config['api']['github']['base_url'])
+            if http_cache_config['enabled']:
+                evict_http_cache(Path(http_cache_config['directory']), http_cache_config['max_age_days'])
+            print("No new updates to report")
+            metrics.status = "no_updates"
+            return
+        
+        print(f"Found {len(issues)} issues/PRs to process")
+        
+        # Before processing content
+        print("\nProcessing issue/PR content and comments...")
+        with metrics.stage("comments", github_session):
+            issues = process_issues_content(
+                issues,
+                config['processing']['limits']['max_input_tokens_per_request'],
+                github_session,
+                config['processing']['concurrency']['github_workers'],
+                config['processing']['limits']['truncation_mode']
+            )
+        log_http_cache_stats(github_session, config['api']['github']['base_url'])
+        
+        # Before preparing job
+        print("\nPreparing kluster.ai batch job...")
+        # Index and lock the run before any of its files are written, so cleanup also finds a run that
+        # dies while preparing and an overlapping run does not take it over
+        file_dir = Path(batch_dir) / datetime.now().strftime(RUN_DIR_FORMAT)
+        file_dir.mkdir(parents=True, exist_ok=True)
+        store.register(file_dir, config_id)
+        journal = RunJournal(file_dir, lock=True)
+        with metrics.stage("prepare"):
+            file_dir = prepare_klusterai_job(
+                model=config['api']['klusterai']['model'],
+                requests=issues,
+                batch_dir=batch_dir,
+                file_dir=file_dir,
+                cache_dir=cache_dir,
+                shard_max_requests=config['processing']['batch']['shard_max_requests'],
+                shard_max_mb=config['processing']['batch']['shard_max_mb'],
+                dedupe=config['processing']['batch']['dedupe_requests'],
+                metrics=metrics if config['processing']['metrics']['enabled'] else None
+            )
+        if file_dir is None:
+            metrics.status = "failed"
+            journal.close()
+            store.close()
+            return
+        
+        # The batch input and metadata now hold everything fetched from GitHub
+        journal.record(
+            "fetched",
+            run_started=run_started,
+            issues=len(issues),
+            watermarks=watermarks.pending if watermarks else None
+        )
+    fetched = journal.find("fetched")[0]
+    
+    slack = SlackReporter(
+        channel=config['api']['slack']['channel'],
+        token=config['api']['slack']['token'],
+        base_url=config['api']['slack']['base_url'],
+        debug=config['runtime']['debug'],
+        threads=config['api']['slack']['threads'],
+        max_workers=config['api']['slack']['post_workers'],
+        rate_limit=config['processing']['rate_limit'],
+        journal=journal
     )
+    report = None
+    if not list_input_shards(file_dir):
+        print("\nAll summaries served from cache, skipping batch submission")
+        completed = True
+    else:
+        from openai import OpenAI
+        client = OpenAI(
+            api_key=config['api']['klusterai']['key'],
+            base_url=config['api']['klusterai']['base_url']
+        )
+        
+        # Before submitting job
+        print("\nSubmitting batch job to kluster.ai...")
+        with metrics.stage("upload"):
+            batch_ids = submit_klusterai_job(
+                client=client,
+                file_dir=file_dir,
+                max_workers=config['processing']['batch']['submit_workers'],
+                journal=journal,
+                metrics=metrics,
+                upload_part_mb=config['processing']['batch']['upload_part_mb'],
+                upload_gzip=config['processing']['batch']['upload_gzip'],
+                rate_limit=config['processing']['rate_limit']
+            )
+        print("\nMonitoring batch job status...")
+        if config['processing']['batch']['stream_results']:
+            # Post cached and already downloaded summaries right away, the rest as their shards make progress
+            report = IncrementalReport(config['api']['github']['owner'], slack, file_dir, fetched["run_started"])
+            with metrics.stage("post", slack.session):
+                for custom_id, response in iter_batch_results(file_dir):
+                    report.add(custom_id, response)
+                if not journal.has("merged"):
+                    for shard in journal.finished():
+                        result_path = batch_result_path(file_dir, batch_ids[shard])
+                        if result_path.exists():
+                            for result in iter_jsonl(result_path):
+                                report.add(result.get("custom_id", "N/A"), result.get("response", {}))
+        
+        # Download each shard's results as soon as they are available
+        finished = journal.finished()
+        with metrics.stage("monitor"):
+            for batch_status, done, new_results in iter_partial_results(
+                client,
+                [batch_id for shard, batch_id in enumerate(batch_ids) if shard not in finished],
+                file_dir,
+                config['processing']['batch']['poll_min_seconds'],
+                config['processing']['batch']['poll_max_seconds'],
+                partial=report is not None,
+                metrics=metrics
+            ):
+                if report:
+                    with metrics.stage("post", slack.session):
+                        for custom_id, response in new_results:
+                            report.add(custom_id, response)
+                if not done:
+                    continue
+                
+                journal.record("finished", shard=batch_ids.index(batch_status.id), status=batch_status.status.lower())
+                if batch_status.status.lower() != "completed":
+                    print(f"\nBatch job {batch_status.id} failed with status: {batch_status.status}")
+        
+        completed_shards = sorted(shard for shard, status in journal.finished().items() if status == "completed")
+        completed = bool(completed_shards)
+        if completed and not journal.has("merged"):
+            print(f"\n{len(completed_shards)}/{len(batch_ids)} batch jobs completed successfully")
+            with metrics.stage("merge"):
+                merge_shard_results(file_dir, [batch_result_path(file_dir, batch_ids[shard]) for shard in completed_shards])
+                if cache_dir:
+                    store_cached_summaries(file_dir, cache_dir, config['api']['klusterai']['model'])
+            journal.record("merged")
+            for shard in journal.finished():
+                batch_result_path(file_dir, batch_ids[shard]).unlink(missing_ok=True)
+        
+        if report:
+            print("\nPosting remaining results to Slack...")
+            with metrics.stage("post", slack.session):
+                report.finish()
     
-    print("\nMonitoring batch job status...")
-    batch_status = monitor_batch_status(client, batch_id)
-    
-    if batch_status.status.lower() == "completed":
-        print("\nBatch job completed successfully")
-        retrieve_result_file_contents(batch_status, client, file_dir)
+    if completed and report is None:
         print("\nPosting results to Slack...")
-        process_and_post_results(
-            org_name=config['api']['github']['owner'],
-            slack_channel=config['api']['slack']['channel'],
-            slack_token=config['api']['slack']['token'],
-            file_dir=file_dir,
-            debug=config['runtime']['debug']
-        )
+        with metrics.stage("post", slack.session):
+            process_and_post_results(
+                org_name=config['api']['github']['owner'],
+                slack=slack,
+                file_dir=file_dir,
+                run_started=fetched["run_started"]
+            )
+    
+    # Only a completed run moves the window, so an interrupted one is resumed rather than skipped.
+    # Issues without a summary stay in the window and are fetched again by the next run.
+    unsummarized = unsummarized_issues(file_dir)
+    if unsummarized:
+        print(f"\n{len(unsummarized)} issues/PRs got no summary, they are fetched again next run")
     else:
-        print(f"\nBatch job failed with status: {batch_status.status}")
+        update_last_run_time(last_run_file, fetched["run_started"])
+    if watermarks:
+        if fetched.get("watermarks"):
+            watermarks.commit(fetched["watermarks"], unsummarized)
+        watermarks.close()
+    journal.record("completed")
+    journal.close()
+    store.complete(file_dir)
             
     if config['processing']['batch']['cleanup']:
         print("\nCleaning up batch files...")
         cleanup_batch_files(
             keep_days=config['processing']['batch']['keep_days'],
-            batch_dir=config['processing']['batch']['generated_files_directory']
+            batch_dir=config['processing']['batch']['generated_files_directory'],
+            store=store
         )
+    
+    # Compress what is kept, after cleanup so expired runs are not compressed first
+    if config['processing']['batch']['compress_artifacts']:
+        with metrics.stage("archive"):
+            store.archive_completed()
+    store.close()
+    
+    if cache_dir:
+        evict_summary_cache(cache_dir, cache_config['max_age_days'], cache_config['max_size_mb'])
+    
+    if http_cache_config['enabled']:
+        evict_http_cache(Path(http_cache_config['directory']), http_cache_config['max_age_days'])
 
     print("\n=== GitHub Issue/PR Summarizer Completed ===\n")
 
@@ -31,8 +31,11 @@ cd "$BASE_DIR"
 # Activate virtual environment
 source "$BASE_DIR/.venv/bin/activate"
 
-# Ensure dependencies are installed
-pip install --quiet -r requirements.txt
+# Ensure dependencies are installed, only when requirements.txt changed since the last install
+REQUIREMENTS_STAMP="$BASE_DIR/.venv/.requirements.sha256"
+if ! sha256sum --check --status "$REQUIREMENTS_STAMP" 2>/dev/null; then
+    pip install --quiet -r requirements.txt && sha256sum requirements.txt > "$REQUIREMENTS_STAMP"
+fi
 
 # Construct the command with arguments
 CMD="python3 main.py --config \"$CONFIG_FILE\""